@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import difflib
+from concurrent.futures import ProcessPoolExecutor
+
+# Local imports
+from lexer import CompileError
+from parser import compile_source
+from emitter import Emitter, ListSink
+from cache import CompileCache, CACHE_SIZE
+
+# Lines of each differing file shown in the summary
+DIFF_LINES = 10
+
+# Compile cache of this process, if any, set up by open_cache
+cache = None
+
+
+# Give this process its own handle on the shared cache directory
+def open_cache(directory, max_bytes):
+    global cache
+
+    cache = CompileCache(directory, max_bytes) if directory else None
+
+
+# Compile one file in a worker and write what the CLI would have printed:
+# the OAL code, or the code generated before an error followed by the error.
+# Every exception is caught, so one bad file cannot stop the batch. Only code
+# that compiled is cached. Returns (name, error message or None,
+# output text, whether the cache had it or None without a cache).
+def compile_file(job):
+    name, input_filename, output_filename, optimize, inline = job
+    sink = ListSink()
+    emitter = Emitter(sink)
+    message = None
+    text = hit = None
+
+    try:
+        with open(input_filename) as f:
+            if cache:
+                source = f.read()
+                key = cache.key(source, optimize, inline)
+                text = cache.get(key)
+                hit = text is not None
+            else:
+                source = f
+
+            if text is None:
+                compile_source(source, optimize, emitter, inline=inline)
+    except CompileError as e:
+        message = str(e)
+    except OSError as e:
+        message = f'{e.strerror}: {input_filename}'
+    except Exception as e:
+        # Any other failure, such as a file that is not UTF-8 or
+        # RecursionError on deeply nested input, fails this file alone
+        message = f'{type(e).__name__}: {e}'
+
+    emitter.close()
+
+    if text is None:
+        if message:
+            sink.write([message])
+
+        text = sink.getvalue()
+
+        if cache and not message:
+            cache.put(key, text)
+
+    with open(output_filename, 'w') as f:
+        f.write(text)
+
+    return name, message, text, hit
+
+
+# Compile every file in input_dir with jobs worker processes, writing
+# NAME.oal files to output_dir. With expected_dir, each output must also
+# match expected_dir/NAME.oal to pass, and with cache_dir, compiled code is
+# shared through a CompileCache there. optimize and inline are as for
+# compile_source. Returns the number of failures.
+def run_batch(input_dir, output_dir, jobs=None, expected_dir=None, optimize=False,
+              cache_dir=None, cache_size=None, inline=None, file=sys.stdout):
+    os.makedirs(output_dir, exist_ok=True)
+
+    filenames = sorted(
+        filename for filename in os.listdir(input_dir)
+        if os.path.isfile(os.path.join(input_dir, filename)))
+
+    batch = []
+    for filename in filenames:
+        name = os.path.splitext(filename)[0]
+        batch.append((name, os.path.join(input_dir, filename), os.path.join(output_dir, f'{name}.oal'), optimize, inline))
+
+    jobs = jobs if jobs else os.cpu_count()
+    start = time.perf_counter()
+
+    cache_args = (cache_dir, CACHE_SIZE if cache_size is None else cache_size)
+
+    if jobs == 1:
+        open_cache(*cache_args)
+        results = map(compile_file, batch)
+    else:
+        pool = ProcessPoolExecutor(jobs, initializer=open_cache, initargs=cache_args)
+        results = pool.map(compile_file, batch, chunksize=max(len(batch) // (4*jobs), 1))
+
+    fails = hits = misses = 0
+    for name, message, text, hit in results:
+        if hit is not None:
+            hits += hit
+            misses += not hit
+
+        failure = check_output(name, message, text, output_dir, expected_dir)
+
+        if failure:
+            fails += 1
+            print(f'batch: [fail] {name}: {failure[0]}', file=file)
+
+            for line in failure[1:]:
+                print(f'    {line}', file=file)
+        else:
+            print(f'batch: [pass] {name}', file=file)
+
+    if jobs != 1:
+        pool.shutdown()
+
+    elapsed = time.perf_counter() - start
+    rate = len(batch) / elapsed if elapsed else 0
+
+    print(f'batch: {len(batch) - fails} passed, {fails} failed', file=file)
+    if cache_dir:
+        print(f'batch: cache {hits} hits, {misses} misses', file=file)
+    print(f'batch: {len(batch)} files in {elapsed:.2f} s ({rate:.1f} files/sec, {jobs} jobs)', file=file)
+
+    return fails
+
+
+# Reason a compile failed, followed by lines of detail, or None if it passed.
+# Without an expected output, a compile passes if it had no error.
+def check_output(name, message, text, output_dir, expected_dir):
+    if not expected_dir:
+        return [message] if message else None
+
+    expected_filename = os.path.join(expected_dir, f'{name}.oal')
+
+    try:
+        with open(expected_filename) as f:
+            expected = f.read()
+    except FileNotFoundError:
+        return [f'no expected output {expected_filename}']
+
+    if text == expected:
+        return None
+
+    output_filename = os.path.join(output_dir, f'{name}.oal')
+    diff = list(difflib.unified_diff(
+        expected.splitlines(), text.splitlines(), expected_filename, output_filename, lineterm=''))
+
+    if len(diff) > DIFF_LINES:
+        diff[DIFF_LINES:] = [f'... {len(diff) - DIFF_LINES} more lines']
+
+    return [f'differs from {expected_filename}', *diff]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""Compiling a directory of programs with one parser.py process per file,
+as check.sh does, versus parser.py --batch with a process pool, with and
+without a compile cache (first cold, then warm).
+
+Usage: benchmarks/bench_batch.py [N_FILES]
+"""
+
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT, corpus, synthetic_program
+
+from batch import run_batch
+
+PARSER = os.path.join(ROOT, 'parser.py')
+
+
+def one_process_per_file(input_dir, output_dir):
+    for filename in sorted(os.listdir(input_dir)):
+        with open(os.path.join(output_dir, filename + '.oal'), 'w') as f:
+            subprocess.run([sys.executable, PARSER, os.path.join(input_dir, filename)], stdout=f)
+
+
+def main(n_files):
+    with tempfile.TemporaryDirectory() as tmp:
+        input_dir = os.path.join(tmp, 'input')
+        os.mkdir(input_dir)
+
+        # The sample programs, topped up with generated ones of varied size
+        sources = list(corpus())
+        for i in range(n_files - len(sources)):
+            sources.append(synthetic_program(50 + 10*(i % 20)))
+
+        for i, source in enumerate(sources[:n_files]):
+            with open(os.path.join(input_dir, f'prog{i:04}.txt'), 'w') as f:
+                f.write(source)
+
+        print(f'{n_files} files, {os.cpu_count()} CPUs')
+
+        start = time.perf_counter()
+        one_process_per_file(input_dir, tmp)
+        elapsed = time.perf_counter() - start
+        print(f'  one process per file  {elapsed:8.2f} s  {n_files / elapsed:8.1f} files/sec')
+
+        for jobs in sorted({1, 2, os.cpu_count()}):
+            start = time.perf_counter()
+            run_batch(input_dir, os.path.join(tmp, 'output'), jobs, file=io.StringIO())
+            elapsed = time.perf_counter() - start
+            print(f'  --batch -j {jobs:<10} {elapsed:8.2f} s  {n_files / elapsed:8.1f} files/sec')
+
+        cache_dir = os.path.join(tmp, 'cache')
+        for state in ('cold', 'warm'):
+            start = time.perf_counter()
+            run_batch(input_dir, os.path.join(tmp, 'output'), os.cpu_count(), cache_dir=cache_dir, file=io.StringIO())
+            elapsed = time.perf_counter() - start
+            print(f'  --batch --cache {state:<5} {elapsed:8.2f} s  {n_files / elapsed:8.1f} files/sec')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""Check-only mode against a full compile on a synthetic workload: the time
+of one pass over a valid program, and the time to find every error in a
+program with several, by one check against a compile per error (each
+error fixed before the next compile, as a user would).
+
+Usage: benchmarks/bench_check.py [workload options] [--errors N] [--repeat N]
+"""
+
+import argparse
+
+from common import best_of
+
+import workload
+
+from lexer import CompileError
+from parser import compile_source, check_source
+from emitter import Emitter, ListSink
+
+
+def compile_text(source):
+    compile_source(source, emitter=Emitter(ListSink()))
+
+
+# Break every step-th assignment, up to n of them
+def with_errors(source, n):
+    lines = source.split('\n')
+    assignments = [i for i, line in enumerate(lines) if ' := (' in line]
+    broken = {}
+
+    for i in assignments[::max(len(assignments) // n, 1)][:n]:
+        broken[i] = lines[i]
+        lines[i] = lines[i].replace(' := (', ' = (', 1)
+
+    return lines, broken
+
+
+# Compile, fix the line of the error reported, and compile again until clean
+def round_trips(lines, broken):
+    lines = list(lines)
+    compiles = 0
+
+    while True:
+        compiles += 1
+
+        try:
+            compile_text('\n'.join(lines))
+            return compiles
+        except CompileError as e:
+            lines[e.line-1] = broken[e.line-1]
+
+
+def main(args):
+    source = workload.from_arguments(args).program()
+    lines, broken = with_errors(source, args.errors)
+    errors = check_source('\n'.join(lines))
+    print(f'{len(source):,} bytes, {len(broken)} errors, {len(errors)} found by one check')
+
+    full = best_of(args.repeat, compile_text, source)
+    checked = best_of(args.repeat, check_source, source)
+    print(f'  valid program: compile {full*1e3:8.1f} ms   check {checked*1e3:8.1f} ms  ({checked/full - 1:+.1%})')
+
+    compiles = round_trips(lines, broken)
+    fixing = best_of(args.repeat, round_trips, lines, broken)
+    once = best_of(args.repeat, check_source, '\n'.join(lines))
+    print(f'  every error:   {compiles} compiles {fixing*1e3:8.1f} ms   one check {once*1e3:8.1f} ms')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time check-only mode against full compiles.')
+    workload.add_arguments(arg_parser)
+    arg_parser.set_defaults(stmts=200)
+    arg_parser.add_argument('--errors', type=int, default=10, help='errors put in the program (default: %(default)s)')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of each, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""Code eliminated by dead-code removal ahead of the peephole optimizer, per
+program of the input/ corpus and on synthetic workloads, against the
+peephole optimizer alone, and the time each takes.
+
+Usage: benchmarks/bench_deadcode.py [--repeat N]
+"""
+
+import argparse
+import os
+
+from common import ROOT, best_of
+
+import workload
+
+from parser import compile_source
+from peephole import Peephole, count_instructions
+from deadcode import DeadCode
+
+
+def optimize(code, passes):
+    for optimization in passes:
+        code = optimization.optimize(code)
+
+    return code
+
+
+def report(name, source, repeat):
+    code = compile_source(source).code
+    peephole = count_instructions(optimize(code, [Peephole()]))
+    dead_code = DeadCode()
+    both = count_instructions(optimize(code, [dead_code, Peephole()]))
+
+    alone = best_of(repeat, optimize, code, [Peephole()])
+    with_dead_code = best_of(repeat, optimize, code, [DeadCode(), Peephole()])
+
+    print(f'{name:<36} {count_instructions(code):>7,} -> peephole {peephole:>7,}  deadcode+peephole {both:>7,}'
+          f'  ({dead_code.procedures} procedures)  {alone*1e3:7.2f} / {with_dead_code*1e3:7.2f} ms')
+
+
+def main(args):
+    input_dir = os.path.join(ROOT, 'input')
+
+    for filename in sorted(os.listdir(input_dir)):
+        with open(os.path.join(input_dir, filename)) as f:
+            report(filename, f.read(), args.repeat)
+
+    for stmts in (2, 5, 20):
+        report(f'workload, {stmts} statements per block', workload.Workload(procs=4, depth=3, stmts=stmts).program(), args.repeat)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure code eliminated by dead-code removal.')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of each optimization, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
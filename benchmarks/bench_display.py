@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""Display pushes and pops at call sites with every register from the
+caller's level down to the callee's saved, against only those the call can
+change, per program of the input/ corpus that makes calls, and the time
+the analysis takes.
+
+Usage: benchmarks/bench_display.py [--repeat N]
+"""
+
+import os
+import argparse
+
+from common import ROOT, best_of
+
+from parser import compile_source
+from display import DisplaySaves
+from oal import JS, PUSH, POP
+
+
+def saves(code):
+    return sum(1 for op in code.ops if op in (PUSH, POP))
+
+
+def report(name, source, repeat):
+    code = compile_source(source).code
+    calls = sum(1 for op in code.ops if op == JS)
+
+    if not calls:
+        return
+
+    display = DisplaySaves()
+    trimmed = display.optimize(code)
+    elapsed = best_of(repeat, DisplaySaves().optimize, code)
+
+    print(f'{name:<36} {calls:>3} calls  {saves(code):>4} -> {saves(trimmed):>4} pushes and pops'
+          f'  ({display.trimmed} calls trimmed)  {elapsed*1e3:7.3f} ms')
+
+
+def main(args):
+    input_dir = os.path.join(ROOT, 'input')
+
+    for filename in sorted(os.listdir(input_dir)):
+        with open(os.path.join(input_dir, filename)) as f:
+            report(filename, f.read(), args.repeat)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure display saves removed at call sites.')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of the analysis, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""Cost of writing generated OAL: one print() per instruction versus the
+block-buffered Emitter sinks, plus whole compiles to each sink and the
+memory held by the compact Code buffer versus the same code as text lines.
+
+Usage: benchmarks/bench_emit.py [REPEAT]
+"""
+
+import contextlib
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from common import best_of, synthetic_program
+
+from lexer import Lexer
+from parser import Parser
+from emitter import Emitter, ListSink, FileSink, StdoutSink
+
+
+def compile_to(source, sink):
+    emitter = Emitter(sink)
+    parser = Parser(Lexer(source), emitter)
+    parser.get_token()
+    parser.n_prog()
+    emitter.close()
+
+    return parser.code
+
+
+def held_bytes(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+
+    return held
+
+
+def print_lines(lines, filename):
+    with open(filename, 'w') as f, contextlib.redirect_stdout(f):
+        for line in lines:
+            print(line)
+
+
+def emit_lines(lines, sink):
+    emitter = Emitter(sink)
+    emit = emitter.emit
+
+    for line in lines:
+        emit(line)
+
+    emitter.close()
+
+
+def stdout_emit_lines(lines, filename):
+    with open(filename, 'w') as f, contextlib.redirect_stdout(f):
+        emit_lines(lines, StdoutSink())
+
+
+def main(repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'out.oal')
+
+        for n_stmts in (1000, 10000, 40000):
+            sink = ListSink()
+            source = synthetic_program(n_stmts)
+            code = compile_to(source, sink)
+            lines = sink.lines
+
+            print(f'{n_stmts} statements, {len(lines):,} lines of OAL')
+
+            code_bytes = held_bytes(lambda: compile_to(source, ListSink()))
+            text_bytes = held_bytes(lambda: code.format())
+            print(f'  held   Code buffer {code_bytes / 2**20:>8.2f} MiB   text lines {text_bytes / 2**20:>8.2f} MiB')
+
+            for name, func, args in (
+                ('print() per line', print_lines, (lines, out)),
+                ('Emitter -> StdoutSink', stdout_emit_lines, (lines, out)),
+                ('Emitter -> FileSink', lambda: emit_lines(lines, FileSink(out)), ()),
+                ('Emitter -> ListSink', lambda: emit_lines(lines, ListSink()), ()),
+            ):
+                elapsed = best_of(repeat, func, *args)
+                print(f'  emit   {name:<24} {elapsed*1000:>9.2f} ms  {len(lines)/elapsed:>14,.0f} lines/s')
+
+            for name, make_sink in (('FileSink', lambda: FileSink(out)), ('ListSink', ListSink)):
+                elapsed = best_of(repeat, lambda: compile_to(source, make_sink()))
+                print(f'  compile -> {name:<20} {elapsed*1000:>9.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+"""VM startup time from OAL text versus a memory-mapped binary image.
+
+Usage: benchmarks/bench_image.py [REPEAT]
+"""
+
+import os
+import sys
+import tempfile
+
+from common import best_of, synthetic_program
+
+from lexer import Lexer
+from parser import Parser
+from emitter import Emitter, ListSink
+from image import load_code, write_image
+from vm import VM
+
+
+def compile_source(source):
+    parser = Parser(Lexer(source), Emitter(ListSink()))
+    parser.get_token()
+    parser.n_prog()
+
+    return parser.code
+
+
+def main(repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        text_file = os.path.join(tmp, 'prog.oal')
+        image_file = os.path.join(tmp, 'prog.oalb')
+
+        for n_stmts in (100, 1000, 10000, 40000):
+            code = compile_source(synthetic_program(n_stmts))
+
+            with open(text_file, 'w') as f:
+                f.write(code.text())
+            with open(image_file, 'wb') as f:
+                write_image(code, f)
+
+            print(f'{len(code):,} instructions  (text {os.path.getsize(text_file) / 1024:,.0f} KiB, '
+                  f'image {os.path.getsize(image_file) / 1024:,.0f} KiB)')
+
+            for name, filename in (('text', text_file), ('image', image_file)):
+                read = best_of(repeat, load_code, filename)
+                startup = best_of(repeat, lambda: VM(load_code(filename)))
+                print(f'  {name:<6} read {read*1000:>9.2f} ms   read + VM load {startup*1000:>9.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
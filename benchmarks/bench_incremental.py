@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""Recompiling a program with many procedures after one procedure body
+changes: a full compile versus one reusing a ProcedureCache.
+
+Usage: benchmarks/bench_incremental.py [N_PROCEDURES]
+"""
+
+import sys
+import time
+
+from common import best_of
+
+from parser import compile_source
+from incremental import ProcedureCache
+
+
+def procedure(n, n_stmts, extra=''):
+    lines = [f'procedure proc{n};', 'var i, j : integer;', 'begin', f'  i := {n};{extra}']
+
+    for k in range(n_stmts):
+        lines.append(f'  j := (i + {k}) * 2 - total div 3;')
+        lines.append(f"  if j >= total then total := total + 1 else write('x', j);")
+
+    lines.append('  i := 0')
+    lines.append('end;')
+
+    return lines
+
+
+def program(n_procs, n_stmts, edited=None):
+    lines = ['program big;', 'var total : integer;']
+
+    for n in range(n_procs):
+        lines += procedure(n, n_stmts, " write('e');" if n == edited else '')
+
+    lines += ['begin'] + [f'  proc{n};' for n in range(n_procs)] + ['  write(total)', 'end.']
+
+    return '\n'.join(lines)
+
+
+def main(n_procs):
+    n_stmts = 20
+    original = program(n_procs, n_stmts)
+    edited = program(n_procs, n_stmts, edited=n_procs // 2)
+
+    full = best_of(3, compile_source, edited)
+
+    def recompile():
+        procedures = ProcedureCache()
+        compile_source(original, procedures=procedures)
+
+        start = time.perf_counter()
+        result = compile_source(edited, procedures=procedures)
+        times.append(time.perf_counter() - start)
+
+        return result
+
+    times = []
+    for _ in range(3):
+        result = recompile()
+
+    assert result.text == compile_source(edited).text
+
+    print(f'{n_procs} procedures of {2*n_stmts} statements, one edited')
+    print(f'  full compile         {full*1e3:8.1f} ms')
+    print(f'  incremental compile  {min(times)*1e3:8.1f} ms   rebuilt {", ".join(result.stats["rebuilt"])}, '
+          f'reused {len(result.stats["reused"])}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
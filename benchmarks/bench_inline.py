@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+"""Instructions executed and run time of the sort/search program in
+input/allKindsOfThings.txt, whose bubble sort calls swap in its inner loop,
+compiled with -O alone and with procedures inlined at growing size
+thresholds, along with the size of the code.
+
+Usage: benchmarks/bench_inline.py [--queries N] [--repeat N]
+"""
+
+import io
+import os
+import argparse
+
+from common import ROOT, best_of
+
+from parser import compile_source
+from peephole import count_instructions
+from vm import VM
+
+
+def run(code, stdin):
+    vm = VM(code, io.StringIO(stdin), io.StringIO())
+    vm.run()
+
+    return vm
+
+
+def report(name, result, stdin, repeat):
+    vm = run(result.code, stdin)
+    elapsed = best_of(repeat, run, result.code, stdin)
+
+    print(f'{name:<24} {count_instructions(result.code):>5,} instructions  '
+          f'{vm.steps:>12,} executed  {elapsed*1e3:9.2f} ms')
+
+
+def main(args):
+    with open(os.path.join(ROOT, 'input', 'allKindsOfThings.txt')) as f:
+        source = f.read()
+
+    # Fill all 20 slots in descending order, so the sort swaps every pair,
+    # then search for a mix of hits and misses
+    numbers = list(range(200, 0, -10))
+    queries = [(n * 7) % 210 for n in range(args.queries)]
+    stdin = ' '.join(map(str, numbers + [-1] + queries + [-1])) + '\n'
+
+    report('-O', compile_source(source, optimize=True), stdin, args.repeat)
+
+    for size in (8, 32, 128):
+        result = compile_source(source, optimize=True, inline=size)
+        report(f'-O --inline {size}', result, stdin, args.repeat)
+        print(f'  {result.diagnostics[0]}')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure the effect of inlining small procedures.')
+    arg_parser.add_argument('--queries', type=int, default=2000, help='search queries after the sort (default: %(default)s)')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of each program, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
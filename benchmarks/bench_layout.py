@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""Memory reserved with the fixed display and stack sizes against sizes
+from the layout analysis, and the time the analysis takes, over the input/
+corpus and synthetic workloads of growing nesting depth.
+
+Usage: benchmarks/bench_layout.py [--repeat N]
+"""
+
+import argparse
+
+from common import best_of, corpus
+
+import workload
+
+from parser import compile_source
+from peephole import Peephole
+from layout import Layout
+
+
+# Laying out code again leaves it as it is, so it can be timed in place
+def analyse(code):
+    Layout().optimize(code)
+
+
+def report(name, source, repeat):
+    code = Peephole().optimize(compile_source(source).code)
+    layout = Layout()
+    layout.optimize(code)
+
+    (display_before, display), (stack_before, stack) = layout.display, layout.stack
+    elapsed = best_of(repeat, analyse, code)
+    warning = ' (recursive)' if layout.unbounded else ''
+
+    print(f'{name:<28} display {display_before:>3} -> {display:<3} stack {stack_before:>4} -> {stack:<4}{warning:<13}'
+          f'{len(code):>8,} instructions {elapsed*1e3:8.2f} ms')
+
+
+def main(args):
+    for i, source in enumerate(corpus()):
+        report(f'input/ #{i}', source, args.repeat)
+
+    for depth in (1, 2, 4, 6):
+        report(f'workload depth {depth}', workload.Workload(procs=2, depth=depth, stmts=20).program(), args.repeat)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compare fixed memory sizes with those from the layout analysis.')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of the analysis, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""Lexer throughput, before and after the precompiled trivia-skipping scanner,
+and peak memory of a whole-file read versus chunked streaming.
+
+Usage: benchmarks/bench_lexer.py [REPEAT]
+"""
+
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import corpus, synthetic_program
+
+import lexer
+from lexer import Lexer, KEYWORDS
+
+DEBUG = False
+
+# Token spec as it was before trivia moved into the scanner
+LEGACY_SPEC = (
+    (('COMMENT', r'\(\*(.|[\r\n])*?\*\)'),)
+    + lexer.TOKEN_SPEC[:-2]
+    + (('EMPTYCHAR', r"''"), ('NEWLINE', r'\r\n|\n'), ('WHITESPACE', r'[ \t]+'), ('UNKNOWN', r'.'))
+)
+
+
+class LegacyLexer:
+    """The original per-instance, trivia-yielding lexer, kept for comparison."""
+
+    def __init__(self, program):
+        self.program = program
+        self.tokens = self.get_tokens()
+        self.line_no = 1
+
+    def get_tokens(self):
+        token_regex = '|'.join(f'(?P<{token}>{pattern})' for token, pattern in LEGACY_SPEC)
+
+        for match in re.finditer(token_regex, self.program, flags=re.ASCII):
+            token = match.lastgroup
+            lexeme = match.group()
+
+            if token == 'COMMENT':
+                self.line_no += len(lexeme.splitlines())-1
+                continue
+            elif token == 'T_IDENT' and lexeme in KEYWORDS:
+                token = KEYWORDS[lexeme]
+            elif token == 'NEWLINE':
+                self.line_no += 1
+                continue
+            elif token == 'WHITESPACE':
+                continue
+
+            legacy_print_token(token, lexeme)
+
+            yield token, lexeme
+
+
+def legacy_print_token(token, lexeme):
+    if DEBUG:
+        print(f'TOKEN: {token}\t    LEXEME: {lexeme}')
+
+
+def run(lexer_class, sources, repeat):
+    n_tokens = 0
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        for source in sources:
+            for _ in lexer_class(source).tokens:
+                n_tokens += 1
+
+    return n_tokens, time.perf_counter() - start
+
+
+def report(name, sources, repeat):
+    results = {}
+
+    for lexer_class in (LegacyLexer, Lexer):
+        n_tokens, elapsed = run(lexer_class, sources, repeat)
+        results[lexer_class.__name__] = n_tokens / elapsed
+
+    before, after = results['LegacyLexer'], results['Lexer']
+    print(f'{name:<24} before {before:>12,.0f} tok/s   after {after:>12,.0f} tok/s   x{after/before:.2f}')
+
+
+def check_equivalent(sources):
+    # Both lexers must agree on every token and on the final line count
+    for source in sources:
+        old, new = LegacyLexer(source), Lexer(source)
+
+        if list(old.tokens) != [(token, lexeme) for token, lexeme, _ in new.tokens] or old.line_no != new.lines:
+            sys.exit('bench_lexer: token streams differ')
+
+
+def report_streaming(source):
+    with tempfile.NamedTemporaryFile('w', suffix='.txt') as f:
+        f.write(source)
+        f.flush()
+
+        for name, make_lexer in (('whole read', lambda fh: Lexer(fh.read())), ('streamed', Lexer)):
+            tracemalloc.start()
+            start = time.perf_counter()
+
+            with open(f.name) as fh:
+                n_tokens = sum(1 for _ in make_lexer(fh).tokens)
+
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            print(f'{name:<24} {n_tokens / elapsed:>12,.0f} tok/s   peak {peak / 2**20:>8.1f} MiB')
+
+
+def main(repeat):
+    sources = list(corpus())
+    check_equivalent(sources)
+
+    report('input/ corpus', sources, repeat)
+
+    for n_stmts in (1000, 10000, 50000):
+        source = synthetic_program(n_stmts)
+        check_equivalent([source])
+        report(f'synthetic {len(source) // 1024} KiB', [source], 1)
+
+    report_streaming(source)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
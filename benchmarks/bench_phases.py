@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""Throughput and peak memory of each compiler phase on a synthetic
+workload: lexing, parsing with code generation (from tokens lexed up
+front), and emitting the code as OAL text.
+
+Usage: benchmarks/bench_phases.py [workload options] [--repeat N] [--json [FILE]]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import tracemalloc
+
+from common import best_of
+
+import workload
+
+from lexer import Lexer
+from parser import Parser
+from emitter import Emitter, CodeSink, FileSink
+
+
+# Stands in for a Lexer, handing the parser tokens lexed beforehand
+class TokenList:
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+
+
+def lex(source):
+    return list(Lexer(source).tokens)
+
+
+def parse(tokens):
+    sink = CodeSink()
+    parser = Parser(TokenList(tokens), Emitter(sink))
+    parser.get_token()
+    parser.n_prog()
+
+    return sink.code
+
+
+def emit(code, filename):
+    emitter = Emitter(FileSink(filename))
+    emitter.emit_code(code)
+    emitter.close()
+
+
+def peak_memory(func, *args):
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+
+def measure(name, repeat, func, *args, **units):
+    elapsed = best_of(repeat, func, *args)
+    phase = {'phase': name, 'seconds': elapsed, 'peak_bytes': peak_memory(func, *args)}
+
+    for unit, count in units.items():
+        phase[f'{unit}_per_second'] = count / elapsed
+
+    return phase
+
+
+def main(args):
+    source = workload.from_arguments(args).program()
+    tokens = lex(source)
+    code = parse(tokens)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'out.oal')
+
+        results = {
+            'workload': {
+                'procs': args.procs, 'depth': args.depth, 'stmts': args.stmts,
+                'expr_len': args.expr_len, 'arrays': args.arrays, 'seed': args.seed,
+                'source_bytes': len(source), 'tokens': len(tokens), 'instructions': len(code),
+            },
+            'phases': [
+                measure('lex', args.repeat, lex, source, bytes=len(source), tokens=len(tokens)),
+                measure('parse+codegen', args.repeat, parse, tokens, tokens=len(tokens)),
+                measure('emit', args.repeat, emit, code, filename, instructions=len(code)),
+            ],
+        }
+
+    if args.json:
+        text = json.dumps(results, indent=2)
+
+        if args.json == '-':
+            print(text)
+        else:
+            with open(args.json, 'w') as f:
+                f.write(text + '\n')
+        return
+
+    shape = results['workload']
+    print(f'{shape["source_bytes"]:,} bytes, {shape["tokens"]:,} tokens, {shape["instructions"]:,} instructions')
+
+    for phase in results['phases']:
+        rates = '  '.join(f'{value:>12,.0f} {key[:-len("_per_second")]}/s'
+                          for key, value in phase.items() if key.endswith('_per_second'))
+        print(f'  {phase["phase"]:<14} {phase["seconds"]*1e3:9.1f} ms  peak {phase["peak_bytes"] / 2**20:7.2f} MiB  {rates}')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time each compiler phase on a synthetic workload.')
+    workload.add_arguments(arg_parser)
+    arg_parser.set_defaults(stmts=200)
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of each phase, best taken (default: %(default)s)')
+    arg_parser.add_argument('--json', nargs='?', const='-', metavar='FILE', help='write results as JSON to FILE, or stdout')
+
+    main(arg_parser.parse_args())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+"""Latency of compiling one program with a cold parser.py process, with
+client.py against a running parser.py --serve, and with requests sent
+straight over the socket from a warm process.
+
+Usage: benchmarks/bench_serve.py [N_RUNS]
+"""
+
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT
+
+import client
+
+PARSER = os.path.join(ROOT, 'parser.py')
+CLIENT = os.path.join(ROOT, 'client.py')
+PROGRAM = os.path.join(ROOT, 'input', 'allKindsOfThings.txt')
+
+
+def latencies(n_runs, func, *args, **kwargs):
+    times = []
+
+    for _ in range(n_runs):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        times.append(time.perf_counter() - start)
+
+    return times
+
+
+def report(name, times):
+    times = sorted(times)
+    p95 = times[min(len(times)-1, int(len(times) * 0.95))]
+    print(f'  {name:<24} median {statistics.median(times)*1e3:8.2f} ms   p95 {p95*1e3:8.2f} ms')
+
+
+def main(n_runs):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'mipl.sock')
+        out = os.path.join(tmp, 'out.oal')
+
+        server = subprocess.Popen([sys.executable, PARSER, '--serve', path, '-j', '2'])
+        try:
+            while not os.path.exists(path):
+                time.sleep(0.05)
+
+            with open(PROGRAM) as f:
+                source = f.read()
+
+            print(f'{n_runs} compiles of {os.path.basename(PROGRAM)}')
+            report('cold parser.py', latencies(n_runs, subprocess.run, [sys.executable, PARSER, PROGRAM, '-o', out], stderr=subprocess.DEVNULL))
+            report('client.py', latencies(n_runs, subprocess.run, [sys.executable, CLIENT, path, PROGRAM, '-o', out], stderr=subprocess.DEVNULL))
+            report('socket request', latencies(n_runs, client.request, path, source))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
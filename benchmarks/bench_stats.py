@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+"""Compile time of a synthetic workload without statistics, which must cost
+nothing over the uninstrumented compiler, and with --stats collecting them.
+
+Usage: benchmarks/bench_stats.py [workload options] [--repeat N]
+"""
+
+import argparse
+
+from common import best_of
+
+import workload
+
+from parser import compile_source
+from emitter import Emitter, CodeSink
+from stats import CompileStats
+
+
+def compile_once(source, with_stats):
+    compile_source(source, emitter=Emitter(CodeSink()), stats=CompileStats() if with_stats else None)
+
+
+def main(args):
+    source = workload.from_arguments(args).program()
+
+    stats = CompileStats()
+    compile_source(source, emitter=Emitter(CodeSink()), stats=stats)
+    print(f'{len(source):,} bytes, {sum(stats.opcodes.values()):,} instructions, '
+          f'{sum(stats.productions.values()):,} productions, {stats.lookups:,} lookups')
+
+    plain = best_of(args.repeat, compile_once, source, False)
+    counted = best_of(args.repeat, compile_once, source, True)
+    print(f'  without stats {plain*1e3:9.1f} ms')
+    print(f'  with stats    {counted*1e3:9.1f} ms  ({counted/plain - 1:+.1%})')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time compiling with and without statistics.')
+    workload.add_arguments(arg_parser)
+    arg_parser.set_defaults(stmts=200)
+    arg_parser.add_argument('--repeat', type=int, default=5, help='compiles of each kind, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
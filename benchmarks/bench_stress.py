@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""Compile very long programs under the default recursion limit and report
+the deepest Python stack reached while parsing, which should not grow with
+program size: flat statement lists and long a + b + c + ... chains.
+
+Usage: benchmarks/bench_stress.py [MAX_STATEMENTS]
+"""
+
+import sys
+import time
+
+from common import synthetic_program
+
+from lexer import Lexer
+from parser import Parser
+from emitter import Emitter, ListSink
+
+
+# Records the stack depth at every statement and factor
+class DepthParser(Parser):
+    max_depth = 0
+
+    def depth(self):
+        frame, depth = sys._getframe(), 0
+
+        while frame:
+            frame, depth = frame.f_back, depth+1
+
+        self.max_depth = max(self.max_depth, depth)
+
+    def n_stmt(self):
+        self.depth()
+        super().n_stmt()
+
+    def n_factor(self):
+        self.depth()
+        return super().n_factor()
+
+
+def long_chain(n_terms):
+    terms = ' + '.join(['i'] * n_terms)
+    return f'program chain;\nvar i, total : integer;\nbegin\n  i := 1;\n  total := {terms};\n  write(total)\nend.\n'
+
+
+def compile_source(parser_class, source):
+    parser = parser_class(Lexer(source), Emitter(ListSink()))
+    parser.get_token()
+    parser.n_prog()
+
+    return parser
+
+
+def report(name, source):
+    start = time.perf_counter()
+    parser = compile_source(Parser, source)
+    elapsed = time.perf_counter() - start
+
+    depth = compile_source(DepthParser, source).max_depth
+
+    print(f'{name:<32} {len(parser.code):>12,} instructions   {elapsed:>8.2f} s   max stack depth {depth}')
+
+
+def main(max_stmts):
+    print(f'recursion limit {sys.getrecursionlimit()}')
+
+    n = 1000
+    while n <= max_stmts:
+        report(f'{n:,} flat statements', synthetic_program(n, group_size=None))
+        report(f'{n:,}-term add chain', long_chain(n))
+        n *= 10
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""Identifier lookups through nested scopes, before and after the single
+name -> entry-stack symbol table, and memory per symbol table entry.
+
+Usage: benchmarks/bench_symbols.py [DEPTH]
+"""
+
+import sys
+import tracemalloc
+
+from common import best_of
+
+from symboltable import SymbolTable, Entry
+
+LOOKUPS = 200000
+
+
+class LegacyScopes:
+    """The original stack of per-scope dicts, searched innermost first."""
+
+    def __init__(self):
+        self.scopes = []
+
+    def open_scope(self):
+        self.scopes.append({})
+
+    def close_scope(self):
+        self.scopes.pop()
+
+    def add(self, name, var_type, bounds, base_type, label, level):
+        if name in self.scopes[-1]:
+            return None
+
+        entry = self.scopes[-1][name] = LegacyEntry(name, var_type, bounds, base_type, label, level)
+        return entry
+
+    def get(self, ident):
+        for scope in reversed(self.scopes):
+            entry = scope.get(ident)
+
+            if entry:
+                return entry
+
+
+class LegacyEntry:
+    def __init__(self, name, var_type, bounds, base_type, label, level):
+        self.name = name
+        self.var_type = var_type
+        self.bounds = bounds
+        self.base_type = base_type
+        self.label = label
+        self.level = level
+
+
+# Nest depth scopes, each declaring a few locals, then look up a global
+# from the innermost one, as a deeply nested procedure does
+def nested(table_class, depth):
+    table = table_class()
+
+    for level in range(depth):
+        table.open_scope()
+        for name in ('i', 'j', f'p{level}'):
+            table.add(name, 'INTEGER', None, None, None, level)
+
+    table.add('local', 'INTEGER', None, None, None, depth)
+
+    return table
+
+
+def lookups(table, name):
+    get = table.get
+    for _ in range(LOOKUPS):
+        get(name)
+
+
+def entry_memory(entry_class, n=100000):
+    tracemalloc.start()
+    entries = [entry_class(f'x{i}', 'INTEGER', None, None, None, 1) for i in range(n)]
+    for entry in entries:
+        entry.offset = 20
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return size / n
+
+
+def main(max_depth):
+    print(f'{LOOKUPS:,} lookups of a global name')
+
+    depth = 1
+    while depth <= max_depth:
+        legacy = best_of(3, lookups, nested(LegacyScopes, depth), 'p0')
+        current = best_of(3, lookups, nested(SymbolTable, depth), 'p0')
+        print(f'  depth {depth:>3}: scope stack {legacy*1e3:8.1f} ms   entry stacks {current*1e3:8.1f} ms')
+        depth *= 4
+
+    print(f'bytes per entry: plain {entry_memory(LegacyEntry):.0f}, slots {entry_memory(Entry):.0f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 64)
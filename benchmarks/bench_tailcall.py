@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+"""Recursion depth a procedure calling itself in tail position reaches
+compiled plainly, against -O with its self-calls turned into jumps: the
+stack each reserves, and whether the run completes and how long it takes.
+
+Usage: benchmarks/bench_tailcall.py [--repeat N]
+"""
+
+import io
+import argparse
+
+from common import best_of
+
+from parser import compile_source
+from vm import VM, VMError
+
+
+# Sums n down to 1 by recursion, the call the last thing on its path
+PROGRAM = '''program tail;
+var n, s : integer;
+
+procedure sum;
+var x : integer;
+begin
+  x := n;
+  s := s + x;
+  n := n - 1;
+  if n > 0 then sum
+end;
+
+begin
+  n := %d;
+  s := 0;
+  sum;
+  write(s)
+end.
+'''
+
+
+def run(code):
+    vm = VM(code, io.StringIO(), io.StringIO())
+    vm.run()
+
+    return vm
+
+
+def report(name, code, repeat):
+    stack = code.a[code.labels[1]+1]
+
+    try:
+        elapsed = best_of(repeat, run, code)
+    except VMError as e:
+        print(f'  {name:<4} stack {stack:>4} cells  {e}')
+    else:
+        print(f'  {name:<4} stack {stack:>4} cells  {elapsed*1e3:9.2f} ms')
+
+
+def main(args):
+    for depth in (100, 1000, 100000):
+        source = PROGRAM % depth
+
+        print(f'depth {depth:,}')
+        report('', compile_source(source).code, args.repeat)
+        report('-O', compile_source(source, optimize=True).code, args.repeat)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Measure recursion through tail self-calls.')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='runs of each program, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""Cost of tracing that is turned off: the original print functions, called
+on every production and token to check a DEBUG flag, against hooks bound
+to a no-op (rules) or skipped outright (tokens) when the parser and lexer
+are constructed.
+
+Usage: benchmarks/bench_verbosity.py [workload options] [--repeat N]
+"""
+
+import argparse
+
+from common import best_of
+
+import workload
+
+from lexer import Lexer
+from parser import Parser
+from emitter import Emitter, CodeSink
+
+DEBUG = False
+
+
+def legacy_print_rule(lhs, rhs):
+    if DEBUG:
+        print(f'{lhs} -> {rhs}')
+
+
+def legacy_print_token(token, lexeme):
+    if DEBUG:
+        print(f'TOKEN: {token}\t    LEXEME: {lexeme}')
+
+
+# Stands in for a Lexer, handing the parser tokens lexed beforehand
+class TokenList:
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+
+
+def lex(source, trace):
+    lexer = Lexer(source)
+    lexer.trace = trace
+
+    return list(lexer.tokens)
+
+
+def parse(tokens, rule):
+    parser = Parser(TokenList(tokens), Emitter(CodeSink()))
+    if rule:
+        parser.rule = rule
+
+    parser.get_token()
+    parser.n_prog()
+
+
+def main(args):
+    source = workload.from_arguments(args).program()
+    tokens = lex(source, None)
+    print(f'{len(source):,} bytes, {len(tokens):,} tokens')
+
+    for phase, func, arg, legacy in (('lex', lex, source, legacy_print_token), ('parse', parse, tokens, legacy_print_rule)):
+        checked = best_of(args.repeat, func, arg, legacy)
+        bound = best_of(args.repeat, func, arg, None)
+        print(f'  {phase:<6} DEBUG checks {checked*1e3:8.1f} ms   bound hooks {bound*1e3:8.1f} ms  ({bound/checked - 1:+.1%})')
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time compiling with tracing turned off, before and after binding hooks.')
+    workload.add_arguments(arg_parser)
+    arg_parser.set_defaults(stmts=200)
+    arg_parser.add_argument('--repeat', type=int, default=5, help='runs of each, best taken (default: %(default)s)')
+
+    main(arg_parser.parse_args())
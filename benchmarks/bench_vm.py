@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""VM throughput in instructions/sec, running the sort/search program in
+input/allKindsOfThings.txt over a worst-case (descending) array and a long
+run of search queries.
+
+Usage: benchmarks/bench_vm.py [QUERIES]
+"""
+
+import io
+import os
+import sys
+import time
+
+from common import ROOT
+
+from lexer import Lexer
+from parser import Parser
+from emitter import Emitter, ListSink
+from vm import VM
+
+
+def compile_file(filename):
+    with open(filename) as f:
+        parser = Parser(Lexer(f), Emitter(ListSink()))
+        parser.get_token()
+        parser.n_prog()
+
+    return parser.code
+
+
+def main(n_queries):
+    code = compile_file(os.path.join(ROOT, 'input', 'allKindsOfThings.txt'))
+
+    # Fill all 20 slots in descending order, then search for a mix of hits and misses
+    numbers = list(range(200, 0, -10))
+    queries = [(n * 7) % 210 for n in range(n_queries)]
+    stdin = ' '.join(map(str, numbers + [-1] + queries + [-1])) + '\n'
+
+    start = time.perf_counter()
+    vm = VM(code)
+    load_time = time.perf_counter() - start
+
+    vm.stdin, vm.stdout = io.StringIO(stdin), io.StringIO()
+
+    start = time.perf_counter()
+    vm.run()
+    elapsed = time.perf_counter() - start
+
+    print(f'allKindsOfThings, {n_queries:,} queries')
+    print(f'  load     {load_time*1000:>10.2f} ms')
+    print(f'  run      {elapsed*1000:>10.2f} ms   {vm.steps:,} instructions   {vm.steps/elapsed:,.0f} instructions/s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
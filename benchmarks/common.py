@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Let benchmarks import the compiler modules when run as scripts
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def corpus():
+    input_dir = os.path.join(ROOT, 'input')
+
+    for filename in sorted(os.listdir(input_dir)):
+        with open(os.path.join(input_dir, filename)) as f:
+            yield f.read()
+
+
+# A valid program of roughly n_stmts statements. With a group_size, they are
+# grouped into compound statements of that many statements each.
+def synthetic_program(n_stmts, group_size=100):
+    lines = ['program big;', 'var i, j, total : integer;', '    a : array [1..100] of integer;', 'begin']
+
+    for n in range(n_stmts):
+        if group_size and n % group_size == 0:
+            lines.append('  begin')
+
+        lines.append(f'    (* statement {n} *)')
+        lines.append(f'    a[{n % 100 + 1}] := (i + {n}) * 2 - j div 3;')
+
+        if group_size and (n % group_size == group_size-1 or n == n_stmts-1):
+            lines.append(f"    if a[{n % 100 + 1}] >= total then total := total + 1 else write('x', total)")
+            lines.append('  end;')
+        else:
+            lines.append(f"    if a[{n % 100 + 1}] >= total then total := total + 1 else write('x', total);")
+
+    lines.append('  write(total)')
+    lines.append('end.')
+
+    return '\n'.join(lines)
+
+
+def best_of(repeat, func, *args):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
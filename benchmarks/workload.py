@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+
+"""Synthetic MIPL workloads with a given shape: procedures per scope,
+procedure nesting depth, statements per block, operands per expression and
+arrays per scope. Programs are valid, deterministic for a seed, never
+recurse and halt quickly, so they can be compiled and run.
+
+Usage: benchmarks/workload.py [options] > program.txt
+"""
+
+import argparse
+import random
+
+# Elements in every generated array
+ARRAY_SIZE = 10
+
+
+class Workload:
+    def __init__(self, procs=4, depth=2, stmts=20, expr_len=4, arrays=1, seed=0):
+        self.procs = procs          # Procedures declared in each scope, down to depth
+        self.depth = depth          # Levels of procedure nesting
+        self.stmts = stmts          # Statements in each block
+        self.expr_len = expr_len    # Operands in each expression
+        self.arrays = arrays        # Arrays declared in each scope
+        self.random = random.Random(seed)
+        self.n_procs = 0
+
+    def program(self):
+        lines = ['program workload;']
+        ints, arrays = self.declarations(lines, 'g', '')
+        self.block(lines, '', 1, ints, arrays, ints, arrays)
+        lines[-1] += '.'
+
+        return '\n'.join(lines) + '\n'
+
+    # Declare variables of a scope, returning the integer and array names
+    def declarations(self, lines, prefix, indent):
+        ints = [f'{prefix}{i}' for i in range(3)]
+        arrays = [f'{prefix}a{i}' for i in range(self.arrays)]
+
+        lines.append(f'{indent}var {", ".join(ints)} : integer;')
+        for name in arrays:
+            lines.append(f'{indent}    {name} : array [1..{ARRAY_SIZE}] of integer;')
+
+        return ints, arrays
+
+    # Nested procedures, then the statements of a block, which first set
+    # every variable the block declares, since locals start out holding
+    # whatever the stack held before. A block only calls the procedures it
+    # declares, so there is no recursion and each call runs at most as many
+    # blocks as there are levels below it.
+    def block(self, lines, indent, level, ints, arrays, own_ints, own_arrays):
+        callable = []
+
+        if level <= self.depth:
+            for _ in range(self.procs):
+                name = f'p{self.n_procs}'
+                self.n_procs += 1
+
+                lines.append(f'{indent}procedure {name};')
+                local_ints, local_arrays = self.declarations(lines, f'{name}v', indent + '  ')
+                self.block(lines, indent + '  ', level+1, ints + local_ints, arrays + local_arrays,
+                           local_ints, local_arrays)
+                lines[-1] += ';'
+
+                callable.append(name)
+
+        lines.append(f'{indent}begin')
+
+        stmts = self.initialization(indent + '  ', own_ints, own_arrays)
+        stmts += [self.statement(indent + '  ', ints, arrays, callable) for _ in range(max(self.stmts, 1))]
+        lines.append(';\n'.join(stmts))
+
+        lines.append(f'{indent}end')
+
+    # Assignments giving each integer and array element a value, taking
+    # nothing from the random stream so the rest of a program stays the
+    # same for a seed
+    def initialization(self, indent, ints, arrays):
+        stmts = [f'{indent}{name} := {i}' for i, name in enumerate(ints)]
+
+        for name in arrays:
+            stmts += [f'{indent}{name}[{i}] := {i}' for i in range(1, ARRAY_SIZE+1)]
+
+        return stmts
+
+    def statement(self, indent, ints, arrays, callable):
+        choice = self.random.random()
+
+        if choice < 0.1 and callable:
+            return f'{indent}{self.random.choice(callable)}'
+        elif choice < 0.2:
+            return f'{indent}if {self.condition(ints, arrays)} then {self.assignment(ints, arrays)} else write({self.expression(ints, arrays)})'
+        elif choice < 0.25:
+            counter = self.random.choice(ints)
+            return (f'{indent}begin {counter} := 0; while {counter} < 3 do begin '
+                    f'{self.assignment([i for i in ints if i != counter], arrays)}; {counter} := {counter} + 1 end end')
+        elif choice < 0.3:
+            return f"{indent}write('r', {self.expression(ints, arrays)}, '\\')"
+        else:
+            return indent + self.assignment(ints, arrays)
+
+    def assignment(self, ints, arrays):
+        if arrays and self.random.random() < 0.3:
+            target = f'{self.random.choice(arrays)}[{self.random.randint(1, ARRAY_SIZE)}]'
+        else:
+            target = self.random.choice(ints)
+
+        # Scaled down so values grow by at most a constant per assignment
+        return f'{target} := ({self.expression(ints, arrays)}) div {3*self.expr_len}'
+
+    def condition(self, ints, arrays):
+        return f'{self.expression(ints, arrays)} {self.random.choice(("<", "<=", "=", "<>", ">", ">="))} {self.operand(ints, arrays)}'
+
+    # Terms joined by + and -, each at most one * or div since that is all a
+    # MIPL term allows. Terms multiply or divide by a small constant so the
+    # values a program computes stay small.
+    def expression(self, ints, arrays):
+        terms = []
+        remaining = self.expr_len
+
+        while remaining > 0:
+            if remaining > 1 and self.random.random() < 0.3:
+                op = self.random.choice(('*', 'div'))
+                terms.append(f'{self.operand(ints, arrays)} {op} {self.random.randint(1, 3)}')
+                remaining -= 2
+            else:
+                terms.append(self.operand(ints, arrays))
+                remaining -= 1
+
+        expression = terms[0]
+        for term in terms[1:]:
+            expression += f' {self.random.choice("+-")} {term}'
+
+        return expression
+
+    def operand(self, ints, arrays):
+        choice = self.random.random()
+
+        if choice < 0.25:
+            return str(self.random.randint(0, 99))
+        elif choice < 0.4 and arrays:
+            return f'{self.random.choice(arrays)}[{self.random.randint(1, ARRAY_SIZE)}]'
+        else:
+            return self.random.choice(ints)
+
+
+def add_arguments(arg_parser):
+    arg_parser.add_argument('--procs', type=int, default=4, help='procedures declared in each scope (default: %(default)s)')
+    arg_parser.add_argument('--depth', type=int, default=2, help='levels of procedure nesting (default: %(default)s)')
+    arg_parser.add_argument('--stmts', type=int, default=20, help='statements in each block (default: %(default)s)')
+    arg_parser.add_argument('--expr-len', type=int, default=4, help='operands in each expression (default: %(default)s)')
+    arg_parser.add_argument('--arrays', type=int, default=1, help='arrays declared in each scope (default: %(default)s)')
+    arg_parser.add_argument('--seed', type=int, default=0, help='random seed (default: %(default)s)')
+
+
+def from_arguments(args):
+    return Workload(args.procs, args.depth, args.stmts, args.expr_len, args.arrays, args.seed)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Generate a synthetic MIPL program.')
+    add_arguments(arg_parser)
+
+    print(from_arguments(arg_parser.parse_args()).program(), end='')
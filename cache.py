@@ -0,0 +1,137 @@
+import os
+import hashlib
+import tempfile
+
+# Default cap on the total size of cached files
+CACHE_SIZE = 64 << 20
+
+# Modules whose source determines the code the compiler generates
+COMPILER_MODULES = ('lexer', 'parser', 'symboltable', 'oal', 'peephole', 'deadcode', 'display', 'tailcall', 'layout', 'inline', 'emitter')
+
+# Suffix of cached OAL files; anything else in the directory is left alone
+SUFFIX = '.oal'
+
+_fingerprint = None
+
+
+# Hash of the compiler's own source, so a changed compiler never reuses
+# code cached by an older one
+def compiler_fingerprint():
+    global _fingerprint
+
+    if _fingerprint is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+
+        for module in COMPILER_MODULES:
+            with open(os.path.join(root, f'{module}.py'), 'rb') as f:
+                digest.update(f.read())
+
+        _fingerprint = digest.hexdigest()
+
+    return _fingerprint
+
+
+# Compiled OAL text stored on disk under the hash of its source, the
+# compiler fingerprint and the compile options. Files are written to a
+# temporary name and renamed into place, so concurrent processes sharing the
+# directory only ever see complete entries. Each hit touches its file, and
+# once the directory grows past max_bytes the least recently used files are
+# removed.
+class CompileCache:
+    def __init__(self, directory, max_bytes=CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.size = None        # Estimated bytes in the directory, once scanned
+
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source, optimize=False, inline=None):
+        digest = hashlib.sha256(compiler_fingerprint().encode())
+        digest.update(b'-O' if optimize else b'')
+        digest.update(f' --inline {inline}'.encode() if inline is not None else b'')
+        digest.update(b'\0')
+        digest.update(source.encode())
+
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    # Cached text for key, or None
+    def get(self, key):
+        path = self.path(key)
+
+        try:
+            with open(path) as f:
+                text = f.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        # Another process may have evicted it since it was read, which
+        # leaves nothing to mark as recently used, but the text is still good
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        self.hits += 1
+
+        return text
+
+    def put(self, key, text):
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+
+            os.replace(temp, self.path(key))
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+        # Other processes may be adding files too, so the directory is only
+        # rescanned once this process's estimate says it has grown too big
+        if self.size is not None:
+            self.size += len(text)
+
+        if self.size is None or self.size > self.max_bytes:
+            self.evict()
+
+    # Remove least recently used files until the cache fits in max_bytes
+    def evict(self):
+        entries = []
+        total = 0
+
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        entries.sort()
+
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+            total -= size
+
+        self.size = total
+
+    def summary(self):
+        return f'cache: {self.hits} hits, {self.misses} misses'
@@ -14,9 +14,21 @@ EXPECTED="./sample_oal"
 REPORTS="./reports"
 mkdir -p $REPORTS
 
+# Where to find programs with errors, checked with --check
+ERRORS="./errors"
+
+# Where to find input fed to programs when they are run
+STDIN="./stdin"
+
+# Where to find the expected output of running the generated code
+RUN_EXPECTED="./expected"
+
 # The name of the executable file
 EXEC=./parser.py
 
+# The name of the OAL virtual machine
+VM=./vm.py
+
 green=`tput setaf 2`
 red=`tput setaf 1`
 reset=`tput sgr0`
@@ -24,6 +36,33 @@ reset=`tput sgr0`
 fails=0
 passes=0
 
+# Compile with the given flags, run the code and compare what it printed
+run_check() {
+    testname=$1 filename=$2 flags=$3 label=$4
+    report="$REPORTS/$filename.${label// /}"
+
+    # Flags go after the file, since --inline takes an optional size, and
+    # code left from an earlier run must not stand in for a failed compile
+    rm -f "$OUTPUT/$filename.oal"
+    ${EXEC} "$INPUT/$filename" $flags -o "$OUTPUT/$filename.oal" 2> /dev/null
+
+    # feed input if the program reads any
+    stdin="$STDIN/$filename"
+    [ -f "$stdin" ] || stdin=/dev/null
+    ${VM} "$OUTPUT/$filename.oal" < "$stdin" > "$OUTPUT/$filename.run"
+
+    diff "$OUTPUT/$filename.run" "$RUN_EXPECTED/$filename.out" > "$report"
+
+    if [ $? -ne 0 ]; then
+        fails=$[ $fails + 1 ]
+        echo "check: ${red}[fail]${reset} $testname ($label)"
+        head "$report"
+    else
+        passes=$[ $passes + 1 ]
+        echo "check: ${green}[pass]${reset} $testname ($label)"
+    fi
+}
+
 for f in $INPUT/*; do
     filename=$(basename $f) # strip path
     testname="${filename%.*}" # strip extension
@@ -42,6 +81,33 @@ for f in $INPUT/*; do
         passes=$[ $passes + 1 ]
         echo "check: ${green}[pass]${reset} $testname"
     fi
+
+    # run the generated code, plain, as a binary image, optimized and with
+    # procedures inlined
+    run_check "$testname" "$filename" "" "run"
+    run_check "$testname" "$filename" "-b" "run -b"
+    run_check "$testname" "$filename" "-O" "run -O"
+    run_check "$testname" "$filename" "--inline" "run --inline"
+    run_check "$testname" "$filename" "-O --inline 1000" "run -O --inline 1000"
+done
+
+# Check broken programs, comparing every error reported to the expected list
+for f in $ERRORS/*; do
+    filename=$(basename $f)
+    testname="${filename%.*}"
+
+    ${EXEC} --check "$ERRORS/$filename" > "$OUTPUT/$filename.check" 2> /dev/null
+
+    diff "$OUTPUT/$filename.check" "$RUN_EXPECTED/$filename.check" > "$REPORTS/$filename.check"
+
+    if [ $? -ne 0 ]; then
+        fails=$[ $fails + 1 ]
+        echo "check: ${red}[fail]${reset} $testname (check)"
+        head "$REPORTS/$filename.check"
+    else
+        passes=$[ $passes + 1 ]
+        echo "check: ${green}[pass]${reset} $testname (check)"
+    fi
 done
 
 echo "check: ${green}$passes tests passed${reset}"
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import sys
+import json
+import socket
+import argparse
+
+# Client for parser.py --serve. It only needs the standard library, so it
+# starts much faster than the compiler itself would.
+
+
+# inline is a size, True for the server's default size, or None
+def request(path, source, optimize=False, inline=None):
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({'source': source, 'optimize': optimize, 'inline': inline}).encode() + b'\n')
+
+        with sock.makefile('rb') as f:
+            line = f.readline()
+
+    if not line:
+        raise ConnectionError('compile server closed the connection')
+
+    return json.loads(line)
+
+
+def main(path, input_filename, output_filename=None, optimize=False, inline=None):
+    with open(input_filename) as f:
+        source = f.read()
+
+    try:
+        reply = request(path, source, optimize, inline)
+    except OSError as e:
+        print(f'{e.strerror or e}: {path}', file=sys.stderr)
+        sys.exit(2)
+
+    # Write just what parser.py would have
+    if output_filename:
+        with open(output_filename, 'w') as f:
+            f.write(reply['text'])
+    else:
+        sys.stdout.write(reply['text'])
+
+    if not reply['ok']:
+        print(reply['error'])
+        sys.exit(1)
+
+    for diagnostic in reply.get('diagnostics', ()):
+        print(diagnostic, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compile a MIPL program with a running parser.py --serve.')
+    arg_parser.add_argument('socket', help='socket the compile server listens on')
+    arg_parser.add_argument('input', help='MIPL source file')
+    arg_parser.add_argument('-o', '--output', help='write OAL code here instead of stdout')
+    arg_parser.add_argument('-O', '--optimize', action='store_true', help='fold constant expressions and run the peephole optimizer')
+    arg_parser.add_argument('--inline', metavar='N', nargs='?', type=int, const=True,
+                            help="inline procedures of at most N instructions that call no others (default N: the server's)")
+    args = arg_parser.parse_args()
+
+    main(args.socket, args.input, args.output, args.optimize, args.inline)
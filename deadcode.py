@@ -0,0 +1,100 @@
+# Local imports
+from peephole import count_instructions
+from oal import (
+    Code, UNCONDITIONAL, RESERVED_LABELS, MAIN_LABEL,
+    LABEL, COMMENT, INIT, BSS, END, SAVE, JS, JF, JP, LC,
+)
+
+# Instructions that are kept wherever they are, since they never execute
+DIRECTIVES = frozenset((INIT, BSS, END))
+
+
+# Removes code the program can never run. Branches on a constant drop
+# the test, and the arm it skips is left unreachable. Then every instruction
+# reachable from the main program is marked, following jumps and calls, and
+# the rest goes: procedures that are never called (even ones called only
+# from other dead procedures), dead arms, and labels nothing jumps to any
+# more.
+class DeadCode:
+    def __init__(self):
+        self.removed = 0        # Instructions removed by the last optimize()
+        self.procedures = 0     # Procedures removed
+        self.branches = 0       # Branches on a constant removed
+
+    def optimize(self, code):
+        ops, a, b = code.ops.tolist(), code.a.tolist(), code.b.tolist()
+
+        folded = self.fold_branches(ops, a)
+
+        positions = {a[i]: i for i, op in enumerate(ops) if op == LABEL}
+        live = self.reachable(ops, a, positions, folded) - folded
+        targets = {a[i] for i in live if ops[i] in (JS, JF, JP)}
+
+        optimized = Code()
+        optimized.comments = code.comments
+
+        for i, op in enumerate(ops):
+            if op == LABEL:
+                if a[i] in targets or a[i] in RESERVED_LABELS:
+                    optimized.label(a[i])
+                elif i+1 < len(ops) and ops[i+1] == SAVE:
+                    self.procedures += 1
+            elif i in live or op in DIRECTIVES or (op == COMMENT and self.commenting(ops, live, i)):
+                optimized.emit(op, a[i], b[i])
+
+        self.removed = count_instructions(code) - count_instructions(optimized)
+
+        return optimized
+
+    # lc true; jf L  ->  (nothing), and lc false; jf L  ->  jp L. Returns
+    # the indices of the instructions dropped.
+    def fold_branches(self, ops, a):
+        folded = set()
+
+        for i in range(1, len(ops)):
+            if ops[i] == JF and ops[i-1] == LC:
+                if a[i-1]:
+                    folded.add(i)
+                else:
+                    ops[i] = JP
+
+                folded.add(i-1)
+                self.branches += 1
+
+        return folded
+
+    # Indices of instructions reachable from the main program
+    def reachable(self, ops, a, positions, folded):
+        live = set()
+        work = [positions[MAIN_LABEL]]
+
+        while work:
+            i = work.pop()
+
+            while i < len(ops) and i not in live:
+                live.add(i)
+                op = ops[i]
+
+                if op == JS or (op == JF and i not in folded):
+                    work.append(positions[a[i]])
+                elif op == JP:
+                    i = positions[a[i]]
+                    continue
+
+                if op in UNCONDITIONAL:
+                    break
+
+                i += 1
+
+        return live
+
+    # A comment stays with the first instruction after it, if that is kept
+    def commenting(self, ops, live, i):
+        while i < len(ops) and ops[i] in (LABEL, COMMENT):
+            i += 1
+
+        return i in live
+
+    def summary(self):
+        return (f'deadcode: removed {self.removed} instructions ({self.procedures} procedures, '
+                f'{self.branches} constant branches)')
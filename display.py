@@ -0,0 +1,96 @@
+# Local imports
+from peephole import count_instructions
+from oal import Code, MAIN_LABEL, LABEL, SAVE, JS, PUSH, POP
+
+
+# Cuts the display registers a call saves and restores down to those the
+# call can change. A call from level Lc to a procedure at level Lp pushes
+# registers Lc down to Lp and pops them after, but the procedure only
+# saves its own level, and leaves changed whatever registers the calls it
+# makes do not restore. Those are worked out over the call graph until
+# they settle, recursion included: a procedure at level L clobbers L, and
+# every level deeper than L clobbered by a procedure it calls. Levels below
+# L are always restored by the calls that change them, so a call only
+# needs the clobbered levels from Lc to Lp saved.
+class DisplaySaves:
+    def __init__(self):
+        self.removed = 0        # Instructions removed by the last optimize()
+        self.calls = 0          # Calls in the code
+        self.trimmed = 0        # Calls that save fewer registers
+        self.clobbers = {}      # Procedure label -> display levels a call to it changes
+
+    def optimize(self, code):
+        ops, a = code.ops, code.a
+        levels, calls = self.call_graph(code)
+        clobbers = self.clobbered(levels, calls)
+
+        # Procedure each push and pop saves the registers of
+        callee = {}
+        for i, op in enumerate(ops):
+            if op == JS:
+                self.calls += 1
+                trimmed = False
+
+                j = i-1
+                while ops[j] == PUSH:
+                    callee[j] = a[i]
+                    trimmed |= a[j] not in clobbers[a[i]]
+                    j -= 1
+
+                j = i+1
+                while ops[j] == POP:
+                    callee[j] = a[i]
+                    j += 1
+
+                self.trimmed += trimmed
+
+        optimized = Code()
+        optimized.comments = code.comments
+
+        for i, (op, a, b) in enumerate(zip(code.ops, code.a, code.b)):
+            if op == LABEL:
+                optimized.label(a)
+            elif i not in callee or a in clobbers[callee[i]]:
+                optimized.emit(op, a, b)
+
+        self.removed = count_instructions(code) - count_instructions(optimized)
+
+        return optimized
+
+    # Display level of every procedure, and the procedures each one calls
+    def call_graph(self, code):
+        levels = {}
+        calls = {}
+        caller = None
+
+        for i, (op, a) in enumerate(zip(code.ops, code.a)):
+            if op == LABEL and (a == MAIN_LABEL or (i+1 < len(code.ops) and code.ops[i+1] == SAVE)):
+                caller = a
+                levels[a] = code.a[i+1] if a != MAIN_LABEL else 0
+                calls[a] = set()
+            elif op == JS:
+                calls[caller].add(a)
+
+        return levels, calls
+
+    # Levels a call to each procedure can change, grown until no call adds any
+    def clobbered(self, levels, calls):
+        clobbers = self.clobbers = {label: {level} for label, level in levels.items()}
+        changed = True
+
+        while changed:
+            changed = False
+
+            for label, callees in calls.items():
+                for callee in callees:
+                    deeper = {level for level in clobbers[callee] if level > levels[label]} - clobbers[label]
+
+                    if deeper:
+                        clobbers[label] |= deeper
+                        changed = True
+
+        return clobbers
+
+    def summary(self):
+        return (f'display: removed {self.removed} push and pop instructions '
+                f'({self.trimmed} of {self.calls} calls save fewer registers)')
@@ -0,0 +1,110 @@
+import sys
+
+# Number of lines buffered before a block is handed to the sink
+BLOCK_SIZE = 4096
+
+# Bytes of write buffering for file sinks
+FILE_BUFFER_SIZE = 1 << 20
+
+
+class Emitter:
+    def __init__(self, sink=None, block_size=BLOCK_SIZE):
+        self.sink = sink if sink else StdoutSink()
+        self.block_size = block_size
+        self.lines = []     # Lines waiting to be written out
+
+    # Queue a line of OAL code, writing out a full block at a time
+    def emit(self, line):
+        lines = self.lines
+        lines.append(line)
+
+        if len(lines) >= self.block_size:
+            self.flush()
+
+    # Format a Code buffer (from instruction start on) as OAL text, a block at a time
+    def emit_code(self, code, start=0):
+        self.flush()
+
+        # Sinks that store code in binary form take the whole buffer as is
+        if hasattr(self.sink, 'write_code'):
+            self.sink.write_code(code)
+            return
+
+        for block_start in range(start, len(code), self.block_size):
+            self.sink.write(code.format(block_start, block_start+self.block_size))
+
+    def flush(self):
+        if self.lines:
+            self.sink.write(self.lines)
+            self.lines = []
+
+        self.sink.flush()
+
+    def close(self):
+        self.flush()
+        self.sink.close()
+
+
+# Keeps every line in memory
+class ListSink:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, lines):
+        self.lines.extend(lines)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def getvalue(self):
+        return ''.join(f'{line}\n' for line in self.lines)
+
+
+# Keeps the code buffer itself, never formatting it as text
+class CodeSink:
+    def __init__(self):
+        self.code = None
+
+    def write_code(self, code):
+        self.code = code
+
+    def write(self, lines):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# Writes to a file through a large buffer
+class FileSink:
+    def __init__(self, filename, buffer_size=FILE_BUFFER_SIZE):
+        self.file = open(filename, 'w', buffering=buffer_size)
+
+    def write(self, lines):
+        self.file.write('\n'.join(lines))
+        self.file.write('\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+# Writes to whatever sys.stdout is at the time of each block
+class StdoutSink:
+    def write(self, lines):
+        sys.stdout.write('\n'.join(lines))
+        sys.stdout.write('\n')
+
+    def flush(self):
+        sys.stdout.flush()
+
+    def close(self):
+        self.flush()
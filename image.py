@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+import sys
+import mmap
+import struct
+import argparse
+from array import array
+
+# Local imports
+from oal import parse_code
+from linker import Program, LinkError, link, unlink
+
+# Binary OAL image layout, all little-endian. An image holds a program as
+# the VM runs it, linked when the image is written (see linker.py):
+#
+#   header       magic, version, whether there is an init, init's display
+#                size, cells of memory, comment count
+#   sections     opcodes, operand a, operand b, code labels and their
+#                instruction index, data labels and their address, labels
+#                never defined, the label number of each jump, then the
+#                index, opcode, a and b of what the VM does not run
+#   comments     uint32 byte length + UTF-8 text, one per comment
+#
+# Each section is a uint32 count and uint8 item size, padded to 8 bytes,
+# then that many signed ints of the smallest size, 1, 2 or 4 bytes, that
+# holds every value, padded to a multiple of 8 bytes. Sections are read in
+# place as views of the mapped file, and the label tables are already
+# resolved, so the VM can start without parsing or linking anything.
+MAGIC = b'OALB'
+VERSION = 3
+HEADER = struct.Struct('<4sHBxiII')
+SECTION = struct.Struct('<IB3x')
+
+# Array typecode of each operand size
+TYPECODES = {1: 'b', 2: 'h', 4: 'i'}
+
+
+class ImageError(Exception):
+    pass
+
+
+def is_image(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def pad8(size):
+    return (size + 7) & ~7
+
+
+def to_little(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+
+    return values
+
+
+# Smallest signed array holding every value
+def narrowest(values):
+    low, high = min(values, default=0), max(values, default=0)
+
+    for size, typecode in TYPECODES.items():
+        bits = 8*size - 1
+        if -(1 << bits) <= low and high < (1 << bits):
+            return array(typecode, values)
+
+    raise ImageError(f'operand {low if low < -(1 << 31) else high} does not fit in 32 bits')
+
+
+def write_padded(f, data):
+    f.write(data)
+    f.write(bytes(pad8(len(data)) - len(data)))
+
+
+def write_section(f, values):
+    values = narrowest(values)
+
+    f.write(SECTION.pack(len(values), values.itemsize))
+    write_padded(f, to_little(values).tobytes())
+
+
+# Write a Program, or a Code buffer linked first
+def write_image(code, f):
+    program = code if isinstance(code, Program) else link(code)
+    display_size = program.display_size
+
+    f.write(HEADER.pack(MAGIC, VERSION, display_size is not None, display_size or 0,
+                        program.mem_size, len(program.comments)))
+    f.write(bytes(pad8(HEADER.size) - HEADER.size))
+
+    for values in sections(program):
+        write_section(f, values)
+
+    for comment in program.comments:
+        text = comment.encode()
+        f.write(struct.pack('<I', len(text)))
+        f.write(text)
+
+
+# Every section of a program's image, in order
+def sections(program):
+    return (program.ops, program.a, program.b,
+            program.targets.keys(), program.targets.values(),
+            program.addresses.keys(), program.addresses.values(),
+            program.undefined, program.jumps, *program.aside)
+
+
+# Build a Program from an image held in any buffer (bytes, mmap, ...). Its
+# arrays are views of the buffer, which stays alive as long as they do.
+def read_image(data):
+    if len(data) < HEADER.size or not is_image(data):
+        raise ImageError('not an OAL image')
+
+    _, version, has_init, display_size, mem_size, n_comments = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ImageError(f'unsupported OAL image version {version}')
+
+    program = Program()
+    program.display_size = display_size if has_init else None
+    program.mem_size = mem_size
+
+    view = memoryview(data)
+    pos = pad8(HEADER.size)
+
+    def section():
+        nonlocal pos
+
+        if pos + SECTION.size > len(data):
+            raise ImageError('truncated OAL image')
+
+        count, size = SECTION.unpack_from(data, pos)
+        if size not in TYPECODES:
+            raise ImageError('invalid item size in OAL image')
+
+        start = pos + SECTION.size
+        end = start + count*size
+        if end > len(data):
+            raise ImageError('truncated OAL image')
+
+        pos = pad8(end)
+
+        if sys.byteorder != 'little':
+            values = array(TYPECODES[size], view[start:end])
+            values.byteswap()
+            return values
+
+        return view[start:end].cast(TYPECODES[size])
+
+    (program.ops, program.a, program.b, target_labels, targets, address_labels, addresses,
+     undefined, program.jumps, *program.aside) = (section() for _ in range(13))
+
+    program.targets = dict(zip(target_labels, targets))
+    program.addresses = dict(zip(address_labels, addresses))
+    program.undefined = list(undefined)
+
+    for _ in range(n_comments):
+        if pos + 4 > len(data):
+            raise ImageError('truncated OAL image')
+
+        length, = struct.unpack_from('<I', data, pos)
+        program.comments.append(bytes(view[pos+4:pos+4+length]).decode())
+        pos += 4 + length
+
+    return program
+
+
+# Map an image file into memory and build its Program over the mapping,
+# which is unmapped once nothing uses the program any more
+def load_image(filename):
+    with open(filename, 'rb') as f:
+        return read_image(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+
+# Load OAL code from either a text file, as a Code buffer, or a binary
+# image, as a Program
+def load_code(filename):
+    with open(filename, 'rb') as f:
+        magic = f.read(len(MAGIC))
+
+    if magic == MAGIC:
+        return load_image(filename)
+
+    with open(filename) as f:
+        return parse_code(f.read())
+
+
+# Emitter sink that writes the code buffer as a binary image when closed
+class ImageSink:
+    def __init__(self, filename):
+        self.filename = filename
+        self.code = None
+
+    def write_code(self, code):
+        self.code = code
+
+    def write(self, lines):
+        raise ImageError('text lines cannot be written to an OAL image')
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.code is not None:
+            with open(self.filename, 'wb') as f:
+                write_image(self.code, f)
+
+
+def main(input_filename, output_filename):
+    with open(input_filename, 'rb') as f:
+        to_text = is_image(f.read(len(MAGIC)))
+
+    try:
+        code = load_code(input_filename)
+    except (ImageError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+    # Convert text to binary and binary back to text
+    if to_text:
+        with open(output_filename, 'w') as f:
+            f.write(unlink(code).text())
+        return
+
+    try:
+        program = link(code)
+    except LinkError as e:
+        print(e)
+        sys.exit(1)
+
+    with open(output_filename, 'wb') as f:
+        write_image(program, f)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Convert OAL code between text and binary image form.')
+    arg_parser.add_argument('input', help='OAL text or binary image')
+    arg_parser.add_argument('output', help='converted file')
+    args = arg_parser.parse_args()
+
+    main(args.input, args.output)
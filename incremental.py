@@ -0,0 +1,111 @@
+import hashlib
+from collections import OrderedDict
+
+# Local imports
+from oal import LABEL, COMMENT, LABEL_OPS
+
+# Default number of procedures kept
+MAX_PROCEDURES = 4096
+
+
+# What code generated inside a procedure relies on about a name declared
+# outside it. Procedure labels are left out since they are renumbered when
+# cached code is reused.
+def signature(entry):
+    if entry.var_type == 'PROCEDURE':
+        return entry.var_type, entry.level
+
+    return (entry.var_type, entry.bounds, entry.base_type, entry.level,
+            getattr(entry, 'offset', None), getattr(entry, 'label', None))
+
+
+# Code generated for one procedure declaration (its header's label through
+# the end of its block, nested procedures included), with the labels it
+# allocated and the names from enclosing scopes it referred to
+class CachedProcedure:
+    __slots__ = ('ops', 'a', 'b', 'comments', 'first_label', 'n_labels', 'references', 'labelled', 'commented')
+
+    def __init__(self, code, start, comment_start, first_label, n_labels, references):
+        self.ops = code.ops[start:]
+        self.a = code.a[start:].tolist()
+        self.b = code.b[start:]
+        self.comments = code.comments[comment_start:]
+        self.first_label = first_label  # Label of the procedure itself
+        self.n_labels = n_labels        # Labels allocated from first_label on
+        self.references = references    # Name -> (signature, label) of outer entries used
+
+        # Instructions whose operand a is a label or a comment
+        self.labelled = [i for i, op in enumerate(self.ops) if op in LABEL_OPS]
+        self.commented = [i for i, op in enumerate(self.ops) if op == COMMENT]
+
+        for i in self.commented:
+            self.a[i] -= comment_start
+
+    # Append the code to a Code buffer, renumbering labels through labels
+    def emit_into(self, code, labels):
+        start = len(code)
+        a = self.a[:]
+
+        for i in self.labelled:
+            a[i] = labels[a[i]]
+
+            if self.ops[i] == LABEL:
+                code.labels[a[i]] = start + i
+
+        for i in self.commented:
+            a[i] += len(code.comments)
+
+        code.ops.extend(self.ops)
+        code.a.extend(a)
+        code.b.extend(self.b)
+        code.comments.extend(self.comments)
+
+
+# Generated code of procedures, keyed by a hash of the tokens of their block
+# along with their nesting level and the compile options, then by the
+# signatures of the outer names they referred to. The same block compiled
+# where those names mean something else is kept as another variant
+# rather than replacing the first, so one long-lived cache can serve many
+# edits of the same program, and going back to an earlier version reuses
+# its code. Least recently used variants are dropped past max_procedures.
+class ProcedureCache:
+    def __init__(self, max_procedures=MAX_PROCEDURES):
+        self.max_procedures = max_procedures
+        self.procedures = OrderedDict()     # (key, references' signatures) -> CachedProcedure
+        self.variants = {}                  # Key -> references' signatures cached under it
+
+    def key(self, tokens, level, fold_constants):
+        digest = hashlib.sha256(f'{level} {fold_constants}'.encode())
+        digest.update('\0'.join(lexeme for _, lexeme, _ in tokens).encode())
+
+        return digest.digest()
+
+    # Most recently used procedure under key for which fits() is true
+    def get(self, key, fits):
+        for variant in reversed(self.variants.get(key, ())):
+            procedure = self.procedures[key, variant]
+
+            if fits(procedure):
+                self.procedures.move_to_end((key, variant))
+                return procedure
+
+        return None
+
+    def put(self, key, procedure):
+        variant = tuple(sorted((name, ident_signature)
+                               for name, (ident_signature, _) in procedure.references.items()))
+        variants = self.variants.setdefault(key, [])
+
+        if variant in variants:
+            variants.remove(variant)
+        variants.append(variant)
+
+        self.procedures[key, variant] = procedure
+        self.procedures.move_to_end((key, variant))
+
+        while len(self.procedures) > self.max_procedures:
+            (key, variant), _ = self.procedures.popitem(last=False)
+            self.variants[key].remove(variant)
+
+            if not self.variants[key]:
+                del self.variants[key]
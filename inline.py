@@ -0,0 +1,188 @@
+# Local imports
+from peephole import count_instructions
+from oal import Code, DATA_LABEL, MAIN_LABEL, LABEL, COMMENT, BSS, HALT, SAVE, ASP, JS, JI, PUSH, POP, LA, JF, JP
+
+# Default most instructions in the body of a procedure that is inlined
+INLINE_SIZE = 32
+
+
+# Code of one procedure, or of the main program, as indices into the
+# instruction list: its label through its ji (or halt), with the body
+# between the frame set up and torn down
+class Block:
+    def __init__(self, instructions, start):
+        self.start = start
+        self.level = 0          # Display level of its frame
+        self.frame = 0          # Cells of locals in its frame
+        self.entry = None       # Index of the asp allocating the frame, if any
+        self.exit = None        # Index of the asp freeing it, if any
+
+        i = start + 1
+
+        if instructions[i][0] == SAVE:
+            self.level = instructions[i][1]
+            i += 1
+
+            if instructions[i][0] == ASP:
+                self.frame = instructions[i][1]
+                self.entry = i
+                i += 1
+
+        self.body_start = i
+
+        while instructions[i][0] not in (JI, HALT):
+            i += 1
+
+        self.end = i
+
+        if instructions[i-1][0] == ASP:
+            self.exit = i-1
+            i -= 1
+
+        self.body_end = i
+
+    def body(self, instructions):
+        return instructions[self.body_start:self.body_end]
+
+
+# Substitutes the bodies of small procedures that call none at their call
+# sites, in place of the display pushes, js and pops of the call and the
+# save, asp and ji of the procedure. The locals of an inlined procedure get
+# cells past the end of its caller's frame (or, in the main program, past
+# the globals), so its la of its own level is moved there; la of an outer
+# level reach the same frame through the display from the caller. A caller
+# left with no calls may be inlined itself in the next round. Procedures
+# that call others, recursive ones among them, are never inlined.
+class Inliner:
+    def __init__(self, max_size=INLINE_SIZE):
+        self.max_size = max_size    # Most instructions in an inlined body
+        self.removed = 0            # Instructions removed by the last optimize(), less those added
+        self.calls = 0              # Calls replaced by a body
+        self.inlined = set()        # Labels of procedures inlined somewhere
+        self.overhead = 0           # Instructions no longer run, summed over the calls replaced
+
+    def optimize(self, code):
+        before = count_instructions(code)
+        instructions = list(zip(code.ops, code.a, code.b))
+
+        while True:
+            blocks = {
+                a: Block(instructions, i) for i, (op, a, _) in enumerate(instructions)
+                if op == LABEL and (a == MAIN_LABEL or (i+1 < len(instructions) and instructions[i+1][0] == SAVE))
+            }
+            bodies = {label: block for label, block in blocks.items() if label != MAIN_LABEL and self.fits(block, instructions)}
+
+            expanded = self.expand(instructions, blocks, bodies)
+            if expanded is None:
+                break
+
+            instructions = expanded
+
+        optimized = Code()
+        optimized.comments = code.comments
+
+        for op, a, b in instructions:
+            if op == LABEL:
+                optimized.label(a)
+            else:
+                optimized.emit(op, a, b)
+
+        self.removed = before - count_instructions(optimized)
+
+        return optimized
+
+    # Whether a procedure is small enough and calls nothing
+    def fits(self, block, instructions):
+        body = [op for op, _, _ in block.body(instructions) if op not in (LABEL, COMMENT)]
+        return len(body) <= self.max_size and JS not in body
+
+    # Instructions with every call to one of bodies replaced by its body,
+    # or None if there is no such call
+    def expand(self, instructions, blocks, bodies):
+        # Cells each block needs for the locals of what is inlined into it,
+        # which is the largest such frame since the bodies never overlap
+        extra = {}
+        for label, block in blocks.items():
+            callees = [a for op, a, _ in instructions[block.start:block.end] if op == JS and a in bodies]
+            if callees:
+                extra[label] = max(bodies[callee].frame for callee in callees)
+
+        if not extra:
+            return None
+
+        next_label = max(a for op, a, _ in instructions if op == LABEL) + 1
+        data = next(i for i, (op, a, _) in enumerate(instructions) if op == LABEL and a == DATA_LABEL)
+        while instructions[data][0] != BSS:
+            data += 1
+
+        out = []
+        caller = None
+        base = 0            # Offset of the first cell for inlined locals in the caller's frame
+        cells = 0           # Cells added to the caller's frame
+        skip = 0            # Pops of an inlined call still to drop
+
+        for i, (op, a, b) in enumerate(instructions):
+            if op == LABEL and a in blocks:
+                caller = blocks[a]
+
+                # The main program's are added to the globals instead
+                if a == MAIN_LABEL:
+                    base, cells = instructions[data][1], 0
+                else:
+                    base, cells = caller.frame, extra.get(a, 0)
+
+            if skip and op == POP:
+                skip -= 1
+            elif i == data:
+                out.append((op, a + extra.get(MAIN_LABEL, 0), b))
+            elif op == JS and a in bodies:
+                callee = bodies[a]
+                pushes = 0
+                while out and out[-1][0] == PUSH:
+                    out.pop()
+                    pushes += 1
+
+                skip = pushes
+                next_label = self.inline(out, instructions, callee, caller.level, base, next_label)
+
+                self.calls += 1
+                self.inlined.add(a)
+                self.overhead += 2*pushes + 3 + (2 if callee.entry is not None else 0)
+            elif cells and i == caller.entry:
+                out.append((ASP, a + cells, b))
+            elif cells and i == caller.exit:
+                out.append((ASP, a - cells, b))
+            elif cells and i == caller.end and caller.exit is None:
+                out.append((ASP, -cells, 0))
+                out.append((op, a, b))
+            else:
+                out.append((op, a, b))
+
+                if cells and i == caller.start+1 and caller.entry is None:
+                    out.append((ASP, cells, 0))
+
+        return out
+
+    # Append the body of callee, called from a block at level, with fresh
+    # labels and its locals moved to base on in the caller's frame. Returns
+    # the next free label.
+    def inline(self, out, instructions, callee, level, base, next_label):
+        labels = {}
+
+        for op, a, b in callee.body(instructions):
+            if op in (LABEL, JF, JP):
+                if a not in labels:
+                    labels[a] = next_label
+                    next_label += 1
+
+                out.append((op, labels[a], b))
+            elif op == LA and b == callee.level:
+                out.append((LA, base + a, level))
+            elif op != COMMENT:
+                out.append((op, a, b))
+
+        return next_label
+
+    def summary(self):
+        return (f'inline: inlined {self.calls} calls to {len(self.inlined)} procedures '
+                f'(at most {self.max_size} instructions), {self.overhead} call instructions removed')
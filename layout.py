@@ -0,0 +1,158 @@
+# Local imports
+from oal import (
+    STACK_EFFECT, DATA_LABEL, STACK_LABEL, MAIN_LABEL,
+    LABEL, INIT, BSS, HALT, SAVE, ASP, JS, JI, PUSH, POP, LA, JF, JP,
+)
+
+# Instructions that end a path through a procedure
+EXITS = frozenset((JI, HALT))
+
+
+# Work out from the code how much memory the program needs and size init
+# and the bss areas to fit, in place of the display of 20 cells and the
+# stack of 500 the parser reserves. The display gets a cell per nesting
+# level. The stack gets the deepest the main program can take it, found by
+# following every path through each procedure for its own operands and
+# frame, plus what the procedures it calls need on top. Recursion leaves
+# that unbounded, so the stack then keeps its 500 cells.
+class Layout:
+    def __init__(self):
+        self.removed = 0        # Instructions removed by the last optimize(), always none
+        self.display = None     # Display cells, before and after
+        self.stack = None       # Stack cells, before and after
+        self.usage = {}         # Procedure label -> stack cells it and its callees use
+        self.unbounded = None   # Why the stack could not be bounded, if it could not
+
+    def optimize(self, code):
+        positions = {a: i for i, (op, a) in enumerate(zip(code.ops, code.a)) if op == LABEL}
+        init = code.ops.index(INIT)
+        data = self.area(code, positions, DATA_LABEL)
+        stack = self.area(code, positions, STACK_LABEL)
+
+        # Globals sit after the display, so they move with its end
+        levels = [a for op, a in zip(code.ops, code.a) if op in (SAVE, PUSH, POP)]
+        levels += [b for op, b in zip(code.ops, code.b) if op == LA]
+        display = max(levels, default=0) + 1
+        shift = display - code.a[init]
+
+        for i, (op, b) in enumerate(zip(code.ops, code.b)):
+            if op == LA and b == 0:
+                code.a[i] += shift
+
+        self.display = code.a[init], display
+        code.a[init] = display
+        code.a[data] += shift
+
+        try:
+            cells = self.bound(code, positions)
+        except Unbounded as e:
+            self.unbounded = str(e)
+            cells = code.a[stack]
+
+        self.stack = code.a[stack], cells
+        code.a[stack] = cells
+
+        return code
+
+    # Index of the bss reserving the area named by label
+    def area(self, code, positions, label):
+        i = positions[label]
+
+        while code.ops[i] != BSS:
+            i += 1
+
+        return i
+
+    # Stack cells the main program uses, calls included
+    def bound(self, code, positions):
+        calls = {}          # Procedure label -> (cells of its own, [(callee, depth at call)])
+        work = [MAIN_LABEL]
+
+        while work:
+            label = work.pop()
+
+            if label not in calls:
+                calls[label] = self.walk(code, positions, positions[label])
+                work.extend(callee for callee, _ in calls[label][1])
+
+        # Callees before their callers, stopping at the first cycle
+        order = []
+        state = {}          # Label -> False while on the path, True once done
+        path = [(MAIN_LABEL, iter(calls[MAIN_LABEL][1]))]
+        state[MAIN_LABEL] = False
+
+        while path:
+            label, callees = path[-1]
+            callee = next(callees, None)
+
+            if callee is None:
+                path.pop()
+                state[label] = True
+                order.append(label)
+            elif callee[0] not in state:
+                state[callee[0]] = False
+                path.append((callee[0], iter(calls[callee[0]][1])))
+            elif not state[callee[0]]:
+                raise Unbounded(f'L.{callee[0]} is recursive')
+
+        usage = self.usage
+        for label in order:
+            own, callees = calls[label]
+            usage[label] = max([own] + [depth + 1 + usage[callee] for callee, depth in callees])
+
+        return usage[MAIN_LABEL]
+
+    # Follow every path through the procedure starting at index start.
+    # Returns the most cells it has on the stack at once, and the procedures
+    # it calls with the cells it has on the stack at each call.
+    def walk(self, code, positions, start):
+        ops, a = code.ops, code.a
+        depths = {}         # Index -> cells on the stack before it runs
+        callees = []
+        peak = 0
+        work = [(start, 0)]
+
+        while work:
+            i, depth = work.pop()
+
+            while i not in depths:
+                depths[i] = depth
+                op = ops[i]
+
+                if op == JS:
+                    callees.append((a[i], depth))
+
+                depth += a[i] if op == ASP else STACK_EFFECT[op]
+                peak = max(peak, depth)
+
+                if op in EXITS:
+                    break
+                elif op == JP:
+                    i = positions[a[i]]
+                elif op == JF:
+                    work.append((positions[a[i]], depth))
+                    i += 1
+                else:
+                    i += 1
+            else:
+                if depths[i] != depth:
+                    raise Unbounded(f'the stack is {depths[i]} or {depth} cells deep at instruction {i}')
+
+        return peak, callees
+
+    def summary(self):
+        if not self.stack:
+            return 'layout: not run'
+
+        text = (f'layout: display {self.display[1]} cells (was {self.display[0]}), '
+                f'stack {self.stack[1]} cells (was {self.stack[0]})')
+
+        if self.unbounded:
+            text += f'; warning: {self.unbounded}, so the stack cannot be bounded'
+
+        return text
+
+
+# The stack use of a program has no static bound
+class Unbounded(Exception):
+    pass
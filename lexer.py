@@ -1,8 +1,8 @@
+import array
+import bisect
+import codecs
+import os
 import re
-from sys import exit
-
-# Print debug output if true
-DEBUG = False
 
 # Reserved words
 KEYWORDS = {
@@ -31,9 +31,15 @@ KEYWORDS = {
     'write':    'T_WRITE',
 }
 
+# Trivia pattern specification (consumed by the scanner, never yielded)
+TRIVIA_SPEC = (
+    ('COMMENT',       r'\(\*[\s\S]*?\*\)'),   # Comments
+    ('NEWLINE',       r'\r\n|\n'),              # Line endings
+    ('WHITESPACE',    r'[ \t]+'),               # Whitespace
+)
+
 # Token pattern specification
 TOKEN_SPEC = (
-    ('COMMENT',       r'\(\*(.|[\r\n])*?\*\)'), # Comments
     ('T_INTCONST',    r'[+-]?\d+'),             # Integer constants
     ('T_CHARCONST',   r"'.'"),                  # Character constants
     ('T_IDENT',       r'[A-Za-z_]\w*'),         # Identifiers
@@ -57,62 +63,234 @@ TOKEN_SPEC = (
     ('T_LBRACK',      r'\['),
     ('T_RBRACK',      r']'),                    # End operators
     ('EMPTYCHAR',     r"''"),                   # Empty character constant
-    ('NEWLINE',       r'\r\n|\n'),              # Line endings
-    ('WHITESPACE',    r'[ \t]+'),               # Whitespace
     ('UNKNOWN',       r'.'),                    # Everything else
 )
 
+# Master scanner, compiled once at import. Each match swallows any leading
+# trivia and then exactly one token (or the end of input, in which case
+# lastgroup is None), so whitespace and comments never reach Python code.
+TOKEN_REGEX = re.compile(
+    '(?:{})*(?:{}|\\Z)'.format(
+        '|'.join(pattern for _, pattern in TRIVIA_SPEC),
+        '|'.join(f'(?P<{token}>{pattern})' for token, pattern in TOKEN_SPEC)),
+    flags=re.ASCII)
+
+NEWLINE_REGEX = re.compile('\n')
+
+# Tokens that need more than a straight yield
+CHECKED_TOKENS = frozenset(('T_IDENT', 'T_INTCONST', 'EMPTYCHAR', 'UNKNOWN'))
+
+# Characters read at a time when the program comes from a file or mmap
+CHUNK_SIZE = 1 << 16
+
+# A match ending closer than this to the end of a partial buffer may be cut
+# short (e.g. ':' of ':=' or the quote of a character constant), so it is
+# rescanned once more input has been read
+LOOKAHEAD = 2
+
+# Characters of a source line shown on either side of an error
+EXCERPT_WIDTH = 80
+
+
+# An error in a MIPL program, found at the given source line and column,
+# with an excerpt of the source pointing at it
+class CompileError(Exception):
+    def __init__(self, message, line=None, column=None, excerpt=None):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.column = column
+        self.excerpt = excerpt
 
+    def __str__(self):
+        if self.line is None:
+            return self.message
+
+        location = self.line if self.column is None else f'{self.line}:{self.column}'
+        text = f'Line {location}: {self.message}'
+
+        return f'{text}\n{self.excerpt}' if self.excerpt else text
+
+
+# An invalid token
+class LexError(CompileError):
+    pass
+
+
+# Tokens are (token, lexeme, offset) tuples, offset being where the lexeme
+# starts in the source. Lines and columns are only worked out when asked
+# for, from the offsets of the line endings read so far.
 class Lexer:
-    def __init__(self, program):
+    # The program may be given as source text, a path (os.PathLike), or an
+    # open file object or mmap, which is then tokenized in bounded chunks
+    # Invalid tokens raise LexError, unless given a list to record them in,
+    # in which case a valid constant stands in for them
+    def __init__(self, program, chunk_size=CHUNK_SIZE, trace_tokens=False, errors=None):
         self.program = program
+        self.chunk_size = chunk_size
+        self.trace = print_token if trace_tokens else None
+        self.errors = errors
         self.tokens = self.get_tokens()
-        self.line_no = 1
+        self.newlines = array.array('q')    # Offset of every line ending read
+        self.end = 0                        # Characters read
+        self.buffer = ''                    # Input being scanned, from the start of a line
+        self.base = 0                       # Offset of the buffer
+
+    # Line and column, both counted from 1, of a source offset
+    def position(self, offset):
+        line = bisect.bisect_left(self.newlines, offset)
+        line_start = self.newlines[line-1] + 1 if line else 0
+
+        return line + 1, offset - line_start + 1
+
+    # Lines in the source read so far
+    @property
+    def lines(self):
+        return len(self.newlines) + 1
+
+    # The source line of an offset with a caret under it, or None once
+    # streaming has moved past that line
+    def excerpt(self, offset):
+        buffer = self.buffer
+        i = offset - self.base
+
+        if not 0 <= i <= len(buffer):
+            return None
+
+        start = max(buffer.rfind('\n', 0, i) + 1, i - EXCERPT_WIDTH)
+        end = buffer.find('\n', i)
+        end = min(len(buffer) if end < 0 else end, i + EXCERPT_WIDTH)
+        line = buffer[start:end].rstrip('\r')
+
+        if not line.strip():
+            return None
+
+        # Tabs are kept so the caret lines up however they are displayed
+        caret = ''.join(c if c == '\t' else ' ' for c in buffer[start:i])
+
+        return f'    {line}\n    {caret}^'
+
+    def invalid(self, message, offset):
+        error = LexError(message, *self.position(offset), self.excerpt(offset))
+
+        if self.errors is None:
+            raise error
+
+        self.errors.append(error)
+
+    def read_chunks(self):
+        source = self.program
+
+        if isinstance(source, str):
+            yield source
+            return
+
+        if isinstance(source, os.PathLike):
+            with open(source) as f:
+                yield from iter(lambda: f.read(self.chunk_size), '')
+            return
+
+        # Binary files and mmaps hand back bytes, which may split a character
+        decoder = codecs.getincrementaldecoder('utf-8')()
+
+        while chunk := source.read(self.chunk_size):
+            if isinstance(chunk, str):
+                yield chunk
+            elif text := decoder.decode(chunk):
+                yield text
+
+        if text := decoder.decode(b'', final=True):
+            yield text
 
     def get_tokens(self):
-        # Build token regex
-        token_regex = '|'.join(f'(?P<{token}>{pattern})' for token, pattern in TOKEN_SPEC)
-
-        # Loop over every match and yield resulting token
-        for match in re.finditer(token_regex, self.program, flags=re.ASCII):
-            token = match.lastgroup
-            lexeme = match.group()
-
-            # Comments
-            if token == 'COMMENT':
-                self.line_no += len(lexeme.splitlines())-1
-                continue
-            # Integer constants
-            elif token == 'T_INTCONST':
-                if not valid_integer(lexeme):
-                    print(f'**** Invalid integer constant: {lexeme}')
-                    exit(1)
-            # Identifiers
-            elif token == 'T_IDENT' and lexeme in KEYWORDS:
-                token = KEYWORDS[lexeme]
-            # Newline
-            elif token == 'NEWLINE':
-                self.line_no += 1
-                continue
-            # Whitespace
-            elif token == 'WHITESPACE':
-                continue
-            # Invalid character constants
-            elif token == 'EMPTYCHAR' or (token == 'UNKNOWN' and lexeme.startswith("'")):
-                print(f'**** Invalid character constant: {lexeme}')
-                exit(1)
-
-            # Print token info
-            print_token(token, lexeme)
-
-            yield token, lexeme
+        keyword = KEYWORDS.get
+        trace = self.trace
+        chunks = self.read_chunks()
+
+        buffer = ''
+        base = 0                # Offset of buffer[0] in the source
+        pos = 0
+        final = False
+        in_comment = False
+
+        while True:
+            limit = len(buffer) - LOOKAHEAD
+
+            # Loop over every match and yield resulting token
+            for match in TOKEN_REGEX.finditer(buffer, pos):
+                token = match.lastgroup
+                end = match.end()
+
+                # The match may continue in input not read yet; rescan it later.
+                # An unmatched '(*' is an unterminated comment so far.
+                if not final:
+                    in_comment = token == 'T_LPAREN' and buffer.startswith('*', end)
+
+                    if in_comment or end > limit:
+                        pos = match.start()
+                        break
+
+                # End of input
+                if token is None:
+                    return
+
+                start = match.start(token)
+
+                lexeme = match.group(token)
+
+                if token in CHECKED_TOKENS:
+                    # Identifiers and reserved words
+                    if token == 'T_IDENT':
+                        token = keyword(lexeme, token)
+                    # Integer constants
+                    elif token == 'T_INTCONST':
+                        if not valid_integer(lexeme):
+                            self.invalid(f'Invalid integer constant: {lexeme}', base + start)
+                            lexeme = '0'
+                    # Invalid character constants
+                    elif token == 'EMPTYCHAR' or lexeme == "'":
+                        self.invalid(f'Invalid character constant: {lexeme}', base + start)
+                        token, lexeme = 'T_CHARCONST', "' '"
+
+                # Print token info
+                if trace:
+                    trace(token, lexeme)
+
+                yield token, lexeme, base + start
+
+            # Drop everything consumed, bar the line it ends on for error
+            # excerpts, and read on. A comment is only ever rescanned once
+            # its closing '*)' has arrived, so a comment spanning many
+            # chunks is still scanned in linear time.
+            cut = max(buffer.rfind('\n', 0, pos) + 1, pos - EXCERPT_WIDTH)
+            buffer = buffer[cut:]
+            base += cut
+            pos -= cut
+
+            while True:
+                chunk = next(chunks, None)
+
+                if chunk is None:
+                    final = True
+                    break
+
+                self.newlines.extend([self.end + match.start() for match in NEWLINE_REGEX.finditer(chunk)])
+                self.end += len(chunk)
+
+                searched = max(len(buffer)-1, 0)
+                buffer += chunk
+
+                if not in_comment or buffer.find('*)', searched) >= 0:
+                    break
+
+            self.buffer = buffer
+            self.base = base
 
 
 def valid_integer(intconst):
     # Python supports arbitrarily large integers, so there's no chance of overflow
-    return int(intconst) <= 2147483647
+    return -2147483648 <= int(intconst) <= 2147483647
 
 
 def print_token(token, lexeme):
-    if DEBUG:
-        print(f'TOKEN: {token}\t    LEXEME: {lexeme}')
+    print(f'TOKEN: {token}\t    LEXEME: {lexeme}')
@@ -0,0 +1,154 @@
+from array import array
+
+# Local imports
+from oal import (
+    Code, MNEMONICS, LABEL_OPS, MAIN_LABEL,
+    LABEL, COMMENT, INIT, BSS, END, SAVE, PUSH, POP, LA, DEREF,
+)
+
+# VM-only superinstruction standing in for la followed by deref, which has
+# no single-instruction form in OAL text
+LV = len(MNEMONICS)
+
+# Instructions the VM does not run, kept aside with their place
+ASIDE = frozenset((LABEL, COMMENT, BSS, END))
+
+
+class LinkError(Exception):
+    pass
+
+
+# Code laid out the way the VM runs it: only the instructions it executes,
+# every label operand resolved to an instruction index, and the memory the
+# bss areas take. Labels, comments, bss areas and whatever follows end are
+# kept aside along with the index of the instruction they came before, and
+# the label number of every jump, so the code can be got back unchanged.
+# Labels that are never defined are collected rather than refused, so
+# that the code of a failed compile can still be stored; the VM refuses
+# to load it.
+class Program:
+    def __init__(self):
+        self.ops = array('B')       # Opcodes the VM runs
+        self.a = array('q')         # First operand, label operands resolved
+        self.b = array('i')         # Second operand
+        self.targets = {}           # Code label -> instruction index
+        self.addresses = {}         # Data label -> memory address
+        self.undefined = []         # Labels jumped to but never defined, in order of use
+        self.mem_size = 0           # Cells taken by every bss area
+        self.display_size = None    # Operand of init, None if there is none
+        self.jumps = array('q')     # Label number of each js, jf and jp, in order
+        self.aside = [array('q') for _ in range(4)]     # Index before, op, a and b of what the VM does not run
+        self.comments = []          # Text of COMMENT instructions, indexed by operand a
+
+    def __len__(self):
+        return len(self.ops)
+
+
+# Lay out a Code buffer for the VM
+def link(code):
+    program = Program()
+    ops, args_a, args_b = program.ops, program.a, program.b
+    targets, addresses = program.targets, program.addresses
+    aside = program.aside
+
+    program.comments = code.comments[:]
+
+    pending = []        # Labels waiting for the instruction they name
+    jumps = []          # Index of each js, jf and jp
+    init = None         # Index of init
+    ended = False
+    previous = None     # Last instruction or label seen
+
+    for op, a, b in zip(code.ops.tolist(), code.a.tolist(), code.b.tolist()):
+        if ended or op in ASIDE:
+            for column, value in zip(aside, (len(ops), op, a, b)):
+                column.append(value)
+
+            if ended:
+                pass
+            elif op == LABEL:
+                pending.append(a)
+            elif op == BSS:
+                for label in pending:
+                    addresses[label] = program.mem_size
+
+                pending = []
+                program.mem_size += a
+            elif op == END:
+                ended = True
+        elif op == DEREF and previous == LA:
+            # Fuse into one instruction; nothing sits between the two
+            ops[-1] = LV
+        else:
+            for label in pending:
+                targets[label] = len(ops)
+
+            pending = []
+
+            if op == INIT:
+                init = len(ops)
+                program.display_size = a
+            elif op in (SAVE, PUSH, POP) and a < 0 or op == LA and b < 0:
+                # A negative display level would wrap around to the end of memory
+                raise LinkError(f'invalid display level in {MNEMONICS[op]} {a}, {b}')
+            elif op in LABEL_OPS:
+                jumps.append(len(ops))
+                program.jumps.append(a)
+
+            ops.append(op)
+            args_a.append(a)
+            args_b.append(b)
+
+        previous = op
+
+    for label in pending:
+        targets[label] = len(ops)
+
+    for i in jumps:
+        if args_a[i] in targets:
+            args_a[i] = targets[args_a[i]]
+        else:
+            program.undefined.append(args_a[i])
+            args_a[i] = -1
+
+    if init is not None:
+        args_a[init] = targets.get(MAIN_LABEL, -1)
+
+    return program
+
+
+# The Code buffer a program was linked from
+def unlink(program):
+    code = Code()
+    code.comments = program.comments[:]
+    aside = zip(*program.aside)
+    jumps = iter(program.jumps)
+    put = next(aside, None)
+
+    def put_aside(op, a, b):
+        if op == LABEL:
+            code.label(a)
+        else:
+            code.emit(op, a, b)
+
+    for i, (op, a, b) in enumerate(zip(program.ops, program.a, program.b)):
+        while put and put[0] == i:
+            put_aside(*put[1:])
+            put = next(aside, None)
+
+        if op == LV:
+            code.emit(LA, a, b)
+            code.emit(DEREF)
+        elif op in LABEL_OPS:
+            code.emit(op, next(jumps), b)
+        elif op == INIT:
+            code.emit(INIT, program.display_size, b)
+        else:
+            code.emit(op, a, b)
+
+    while put:
+        put_aside(*put[1:])
+        put = next(aside, None)
+
+    return code
+
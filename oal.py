@@ -0,0 +1,214 @@
+from array import array
+
+# Opcodes. LABEL and COMMENT are pseudo-instructions that only exist in the
+# text form; every other opcode is one OAL instruction.
+(
+    LABEL, COMMENT,
+    INIT, BSS, END, HALT,
+    SAVE, ASP, JS, JI, PUSH, POP,
+    LA, LC, DEREF, ST,
+    ADD, SUB, MULT, DIV, NEG, AND, OR, NOT,
+    LT, LE, NE, EQ, GT, GE,
+    JF, JP,
+    IREAD, CREAD, IWRITE, CWRITE,
+) = range(36)
+
+# Mnemonic and text template of every opcode, indexed by opcode. Operand a
+# fills the first %d and operand b the second. Label operands are stored as
+# their number, so a == 5 in a jp is 'L.5'. INIT always names the data area
+# L.0, evaluation stack L.1, procedure code L.2 and main program L.3.
+OPCODES = (
+    ('label',   'L.%d:'),
+    ('comment', '# %s'),
+    ('init',    '  init L.0, %d, L.1, L.2, L.3'),
+    ('bss',     '  bss %d'),
+    ('end',     '  end'),
+    ('halt',    '  halt'),
+    ('save',    '  save %d, %d'),
+    ('asp',     '  asp %d'),
+    ('js',      '  js L.%d'),
+    ('ji',      '  ji'),
+    ('push',    '  push %d, %d'),
+    ('pop',     '  pop %d, %d'),
+    ('la',      '  la %d, %d'),
+    ('lc',      '  lc %d'),
+    ('deref',   '  deref'),
+    ('st',      '  st'),
+    ('add',     '  add'),
+    ('sub',     '  sub'),
+    ('mult',    '  mult'),
+    ('div',     '  div'),
+    ('neg',     '  neg'),
+    ('and',     '  and'),
+    ('or',      '  or'),
+    ('not',     '  not'),
+    ('.lt.',    '  .lt.'),
+    ('.le.',    '  .le.'),
+    ('.ne.',    '  .ne.'),
+    ('.eq.',    '  .eq.'),
+    ('.gt.',    '  .gt.'),
+    ('.ge.',    '  .ge.'),
+    ('jf',      '  jf L.%d'),
+    ('jp',      '  jp L.%d'),
+    ('iread',   '  iread'),
+    ('cread',   '  cread'),
+    ('iwrite',  '  iwrite'),
+    ('cwrite',  '  cwrite'),
+)
+
+MNEMONICS = tuple(mnemonic for mnemonic, _ in OPCODES)
+TEMPLATES = tuple(template for _, template in OPCODES)
+
+# Number of operands each opcode formats
+ARITY = tuple(template.count('%d') for template in TEMPLATES)
+
+# Opcodes whose operand a is a label number
+LABEL_OPS = frozenset((LABEL, JS, JF, JP))
+
+# Instructions after which control never falls through
+UNCONDITIONAL = frozenset((JP, JI, HALT))
+
+# Labels init names: the data area (display and globals), the runtime
+# stack, procedure code and the main program. They must survive even
+# though no jump uses them.
+DATA_LABEL, STACK_LABEL, CODE_LABEL, MAIN_LABEL = range(4)
+RESERVED_LABELS = frozenset((DATA_LABEL, STACK_LABEL, CODE_LABEL, MAIN_LABEL))
+
+# Result of each operator on constant operands, or None if it has none.
+# Booleans are 1 and 0, and div truncates toward zero.
+BINARY_OPS = {
+    ADD:  lambda x, y: x + y,
+    SUB:  lambda x, y: x - y,
+    MULT: lambda x, y: x * y,
+    DIV:  lambda x, y: None if y == 0 else (abs(x) // abs(y)) * (1 if (x < 0) == (y < 0) else -1),
+    AND:  lambda x, y: int(bool(x and y)),
+    OR:   lambda x, y: int(bool(x or y)),
+    LT:   lambda x, y: int(x < y),
+    LE:   lambda x, y: int(x <= y),
+    NE:   lambda x, y: int(x != y),
+    EQ:   lambda x, y: int(x == y),
+    GT:   lambda x, y: int(x > y),
+    GE:   lambda x, y: int(x >= y),
+}
+
+UNARY_OPS = {
+    NEG: lambda x: -x,
+    NOT: lambda x: int(not x),
+}
+
+# Cells each instruction leaves on the runtime stack, less those it takes
+# off. asp moves the stack by its operand instead, and js counts as the
+# call returned, with its return address popped again by the callee's ji.
+STACK_EFFECT = {
+    HALT: 0, SAVE: 0, JS: 0, JI: -1, PUSH: 1, POP: -1,
+    LA: 1, LC: 1, DEREF: 0, ST: -2,
+    ADD: -1, SUB: -1, MULT: -1, DIV: -1, NEG: 0, AND: -1, OR: -1, NOT: 0,
+    LT: -1, LE: -1, NE: -1, EQ: -1, GT: -1, GE: -1,
+    JF: -1, JP: 0,
+    IREAD: 1, CREAD: 1, IWRITE: -1, CWRITE: -1,
+    LABEL: 0, COMMENT: 0,
+}
+
+
+# Generated code as parallel opcode/operand arrays, with a table mapping
+# each label number to the index of its LABEL pseudo-instruction
+class Code:
+    def __init__(self):
+        self.ops = array('B')   # Opcodes
+        self.a = array('q')     # First operand (0 if unused)
+        self.b = array('i')     # Second operand (0 if unused)
+        self.labels = {}        # Label number -> instruction index
+        self.comments = []      # Text of COMMENT instructions, indexed by operand a
+
+    def __len__(self):
+        return len(self.ops)
+
+    def emit(self, op, a=0, b=0):
+        self.ops.append(op)
+        self.a.append(a)
+        self.b.append(b)
+
+    def label(self, label):
+        self.labels[label] = len(self.ops)
+        self.emit(LABEL, label)
+
+    def comment(self, text):
+        self.emit(COMMENT, len(self.comments))
+        self.comments.append(text)
+
+    # Drop every instruction from index start on
+    def truncate(self, start):
+        del self.ops[start:], self.a[start:], self.b[start:]
+
+    # Format instructions start up to stop as lines of OAL text
+    def format(self, start=0, stop=None):
+        ops, a, b = self.ops, self.a, self.b
+        lines = []
+        append = lines.append
+
+        for i in range(start, len(ops) if stop is None else min(stop, len(ops))):
+            op = ops[i]
+            arity = ARITY[op]
+
+            if op == COMMENT:
+                append(TEMPLATES[op] % self.comments[a[i]])
+            elif arity == 0:
+                append(TEMPLATES[op])
+            elif arity == 1:
+                append(TEMPLATES[op] % a[i])
+            else:
+                append(TEMPLATES[op] % (a[i], b[i]))
+
+        return lines
+
+    def text(self):
+        return ''.join(f'{line}\n' for line in self.format())
+
+
+# Read OAL text back into a Code buffer
+def parse_code(text):
+    code = Code()
+    opcodes = {mnemonic: op for op, mnemonic in enumerate(MNEMONICS)}
+
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+
+        if not line:
+            continue
+        elif line.startswith('#'):
+            code.comment(line[1:].strip())
+        elif line.endswith(':'):
+            code.label(parse_label(line[:-1], line_no))
+        else:
+            mnemonic, _, rest = line.partition(' ')
+            operands = [operand.strip() for operand in rest.split(',')] if rest else []
+            op = opcodes.get(mnemonic)
+
+            if op is None or op in (LABEL, COMMENT):
+                raise ValueError(f'Line {line_no}: unknown instruction {mnemonic!r}')
+
+            # init names its four fixed labels along with the display size
+            if op == INIT:
+                if len(operands) != 5:
+                    raise ValueError(f'Line {line_no}: init takes 5 operands')
+                operands = operands[1:2]
+
+            if len(operands) != ARITY[op]:
+                raise ValueError(f'Line {line_no}: {mnemonic} takes {ARITY[op]} operand(s)')
+
+            if op in LABEL_OPS:
+                operands[0] = parse_label(operands[0], line_no)
+
+            try:
+                code.emit(op, *map(int, operands))
+            except ValueError:
+                raise ValueError(f'Line {line_no}: invalid operand in {line!r}') from None
+
+    return code
+
+
+def parse_label(label, line_no):
+    if not label.startswith('L.') or not label[2:].isdigit():
+        raise ValueError(f'Line {line_no}: invalid label {label!r}')
+
+    return int(label[2:])
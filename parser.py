@@ -1,76 +1,281 @@
 #!/usr/bin/env python3
 
 import sys
-import inspect
+import json
+import time
+import argparse
+import itertools
 
 # Local imports
-from lexer import Lexer
-from symboltable import SymbolTable
-
-# Print debug output if true
-# TODO: Use integer to determine level of verbosity instead of boolean
-DEBUG = False
+from lexer import Lexer, CompileError, LexError, valid_integer
+from symboltable import SymbolTable, Entry
+from emitter import Emitter, CodeSink, FileSink, StdoutSink
+from image import ImageSink
+from peephole import Peephole, count_instructions
+from layout import Layout
+from deadcode import DeadCode
+from display import DisplaySaves
+from tailcall import TailCalls
+from inline import Inliner, INLINE_SIZE
+from cache import CompileCache, CACHE_SIZE
+from incremental import CachedProcedure, signature
+from stats import CompileStats, CountingSymbolTable, no_phase
+from oal import (
+    Code, parse_code, BINARY_OPS, UNARY_OPS, LABEL, COMMENT, INIT, BSS, END, HALT, SAVE, ASP, JS, JI, PUSH, POP, LA, LC, DEREF, ST,
+    ADD, SUB, MULT, DIV, NEG, AND, OR, NOT, LT, LE, NE, EQ, GT, GE, JF, JP,
+    IREAD, CREAD, IWRITE, CWRITE,
+)
+
+# Verbosity levels: tracing of grammar rules, then also of symbol table
+# changes, then also of every token
+QUIET, RULES, SYMBOLS, TOKENS = range(4)
+
+# Label numbers new_label hands out start here; 0 to 3 are named by init
+FIRST_LABEL = 4
+
+# Most errors a check reports before it gives up
+MAX_ERRORS = 50
+
+# Tokens a statement can start with: FIRST(N_STMT)
+STMT_FIRST = frozenset(('T_IDENT', 'T_READ', 'T_WRITE', 'T_IF', 'T_WHILE', 'T_BEGIN'))
+
+# Tokens a check skips a broken statement up to: FOLLOW(N_STMT), the start
+# of a compound statement, and the end of the program
+STMT_SYNC = frozenset(('T_SCOLON', 'T_END', 'T_ELSE', 'T_BEGIN', 'T_DOT', None))
+
+# Tokens a check skips a broken variable declaration up to: the ';' ending
+# it, or the start of what follows the declarations
+VARDEC_SYNC = frozenset(('T_SCOLON', 'T_PROC', 'T_BEGIN', 'T_DOT', None))
+
+
+# Ends a check that has found as many errors as it reports
+class ErrorLimit(Exception):
+    pass
+
+
+# Code buffer of a check, which generates no code. Its emit, label and
+# comment keep only a count of instructions, for the starts rules take of
+# the code, and the last instruction, for constant() to test a divisor.
+class CheckCode:
+    def __init__(self):
+        self.length = 0
+        self.ops = [None]       # Last opcode
+        self.a = [0]            # Its operand a
+        self.labels = {}
+        self.comments = []
+
+    def __len__(self):
+        return self.length
+
+    def emit(self, op, a=0, b=0):
+        self.length += 1
+        self.ops[0] = op
+        self.a[0] = a
+
+    def label(self, label):
+        self.emit(LABEL, label)
+
+    def comment(self, text):
+        self.emit(COMMENT)
+
+
+# Opcodes of binary operators, by token
+MULT_OPS = {'T_MULT': MULT, 'T_DIV': DIV, 'T_AND': AND}
+REL_OPS = {'T_LT': LT, 'T_LE': LE, 'T_NE': NE, 'T_EQ': EQ, 'T_GT': GT, 'T_GE': GE}
 
 class Parser:
-    def __init__(self, lexer):
+    def __init__(self, lexer, emitter=None, passes=(), fold_constants=False, procedures=None, stats=None, verbosity=QUIET,
+                 errors=None, max_errors=MAX_ERRORS):
         self.lexer = lexer      # Lexer instance
-        self.scopes = []        # Stack of symbol tables
+        self.tokens = lexer.tokens
+        self.symbols = SymbolTable()    # Every open scope
         self.temp_idents = []   # List of idents waiting to be added to symbol table
         
-        self.label_num = 4;
+        self.label_num = FIRST_LABEL
         self.procs = []
 
+        # Generated code, formatted as OAL text into the emitter (stdout
+        # unless told otherwise) once the program has been parsed
+        self.code = Code()
+        self.emit = self.code.emit
+        self.emitter = emitter if emitter else Emitter()
+        self.written = 0        # Number of instructions already written out
+        self.passes = passes    # Optimizations run over the finished code
+        self.fold_constants = fold_constants
+
+        # Code of procedures compiled before (a ProcedureCache), if any
+        self.procedures = procedures
+        self.references = []    # (scope depth, outer names used) per procedure being compiled
+        self.rebuilt = []       # Procedures compiled from source
+        self.reused = []        # Procedures whose cached code was reused
+
+        # Tracing hooks are bound once here, so tracing that is turned off
+        # costs a call to a no-op rather than a check on every use
+        self.verbosity = verbosity
+        self.rule = print_rule if verbosity >= RULES else no_rule
+        self.trace_scope = print if verbosity >= SYMBOLS else no_trace
+        self.trace_entry = print_entry if verbosity >= SYMBOLS else no_trace
+
+        # Counting hooks are only bound when collecting statistics
+        self.stats = stats
+        if stats:
+            self.symbols = CountingSymbolTable(stats)
+            self.tokens = stats.timed_tokens(self.tokens)
+            self.rule = stats.rule_hook(self.rule)
+            self.phase = stats.phase
+        else:
+            self.phase = no_phase
+
+        # A check records errors in a list and recovers from them, until it
+        # has max_errors. The rules it recovers in are swapped in here, so a
+        # compile runs none of their bookkeeping.
+        self.errors = errors
+        self.max_errors = max_errors
+        if errors is not None:
+            self.n_stmt = self.n_stmt_recovering
+            self.n_stmt_lst = self.n_stmt_lst_recovering
+            self.n_var_dec = self.n_var_dec_recovering
+
+            # A check writes no code, so it keeps none
+            self.code = CheckCode()
+            self.emit = self.code.emit
+
     def get_token(self):
         try:
-            self.token, self.lexeme = next(self.lexer.tokens)
+            self.token, self.lexeme, self.offset = next(self.tokens)
         except StopIteration:
             self.token = None
             self.lexeme = None
+            self.offset = None  # End of input
+        except LexError:
+            # As for any other error, the code generated so far comes first
+            self.write_code()
+            raise
 
     def error(self, message):
-        print(f'Line {self.lexer.line_no}: {message}')
-        sys.exit(1)
+        # Write out the code generated so far, as if it had been printed directly
+        self.write_code()
 
-    def open_scope(self):
-        if DEBUG:
-            print('\n\n>>> Entering new scope...')
+        raise self.located(message)
 
-        self.scopes.append(SymbolTable())
+    # An error in what has just been read that leaves the parse in step with
+    # the source, such as a type mismatch. A compile stops at it like any
+    # other; a check records it and carries on.
+    def semantic_error(self, message):
+        if self.errors is None:
+            self.error(message)
 
-    def close_scope(self):
-        if DEBUG:
-            print('\n<<< Exiting scope...')
+        self.record(self.located(message))
+
+    # CompileError at the current token
+    def located(self, message):
+        offset = self.lexer.end if self.offset is None else self.offset
+
+        return CompileError(message, *self.lexer.position(offset), self.lexer.excerpt(offset))
+
+    def record(self, error):
+        self.errors.append(error)
 
-        self.scopes.pop()
+        if len(self.errors) >= self.max_errors:
+            raise ErrorLimit()
+
+    # Carry on as if the given token came before the current one, to repair
+    # a missing token in a check
+    def insert(self, token, lexeme):
+        self.tokens = itertools.chain([(self.token, self.lexeme, self.offset)], self.tokens)
+        self.token = token
+        self.lexeme = lexeme
+
+    # Record the error a rule of a check failed with, then skip tokens up to
+    # one in sync (panic mode)
+    def recover(self, error, sync):
+        self.record(error)
+
+        while self.token not in sync:
+            self.get_token()
+
+    def open_scope(self):
+        self.trace_scope('\n\n>>> Entering new scope...')
+        self.symbols.open_scope()
+
+    def close_scope(self):
+        self.trace_scope('\n<<< Exiting scope...')
+        self.symbols.close_scope()
 
     def new_id(self, name, var_type, bounds=None, base_type=None, label=None, level=None):
-        current_scope = self.scopes[-1]
+        self.trace_entry(name, var_type, bounds, base_type)
 
-        # Add entry to current scope 
-        entry = current_scope.add(name, var_type, bounds, base_type, label, level) 
+        # Add entry to current scope
+        entry = self.symbols.add(name, var_type, bounds, base_type, label, level) 
         if not entry:
-            self.error('Multiply defined identifier')
+            self.semantic_error('Multiply defined identifier')
+
+            # A check carries on with an entry left out of the table
+            entry = Entry(name, var_type, bounds, base_type, label, level)
 
         return entry
 
     # Search for identifier in all open scopes
     def search_id(self, ident_name):
-        for scope in reversed(self.scopes):
-            ident = scope.get(ident_name)
+        ident = self.symbols.get(ident_name)
 
-            if ident:
-                return ident
+        if ident:
+            if self.references:
+                self.refer(ident)
+
+            return ident
 
-        # If loop completes normally, no ident found
-        print(f'called by: {inspect.stack()[1].function}')
         self.error('Unidentified identifier')
 
+    # Note a name used by the procedures being compiled if it was declared
+    # outside them
+    def refer(self, ident):
+        for depth, references in self.references:
+            if ident.depth <= depth:
+                references[ident.name] = ident
+
     def new_label(self):
-        label = f'L.{self.label_num}'
+        label = self.label_num
         self.label_num += 1
 
         return label
 
+    # Return the value of the code from start on if it is a single lc
+    def constant(self, start):
+        code = self.code
+
+        if len(code) - start == 1 and code.ops[-1] == LC:
+            return code.a[-1]
+
+    # Replace the code of an operator and its operands, from start on, with
+    # a single lc when every operand is a constant
+    def fold(self, start):
+        if not self.fold_constants:
+            return
+
+        code = self.code
+        op = code.ops[-1]
+
+        if len(code) - start == 3 and code.ops[start] == LC and code.ops[start+1] == LC:
+            value = BINARY_OPS[op](code.a[start], code.a[start+1])
+        elif len(code) - start == 2 and code.ops[start] == LC:
+            value = UNARY_OPS[op](code.a[start])
+        else:
+            return
+
+        if not valid_integer(value):
+            self.error('Integer constant expression out of range')
+
+        code.truncate(start)
+        self.emit(LC, value)
+
+    # Write out all code generated since the last call
+    def write_code(self):
+        self.emitter.emit_code(self.code, self.written)
+        self.emitter.flush()
+
+        self.written = len(self.code)
+
     def set_offset(self, entry):
         proc = self.procs[-1]
         entry.offset = proc.frame_size
@@ -82,7 +287,7 @@ class Parser:
             proc.frame_size += 1
 
     def n_prog_lbl(self):
-        print_rule('N_PROGLBL', 'T_PROG')
+        self.rule('N_PROGLBL', 'T_PROG')
 
         if self.token == 'T_PROG':
             self.get_token()
@@ -90,7 +295,7 @@ class Parser:
             self.error('syntax error')
 
     def n_prog(self):
-        print_rule('N_PROG', 'N_PROGLBL T_IDENT T_SCOLON N_BLOCK T_DOT')
+        self.rule('N_PROG', 'N_PROGLBL T_IDENT T_SCOLON N_BLOCK T_DOT')
 
         self.n_prog_lbl()
 
@@ -99,7 +304,7 @@ class Parser:
 
         if self.token == 'T_IDENT':
             # Add program to global scope
-            entry = self.new_id(self.lexeme, 'PROGRAM', label='L.3', level=0)
+            entry = self.new_id(self.lexeme, 'PROGRAM', label=3, level=0)
             entry.frame_size = 20
             self.procs.append(entry)
 
@@ -112,8 +317,14 @@ class Parser:
                     self.get_token()
 
                     if self.token:
-                        print('Syntax error: unexpected chars at end of program!')
-                        sys.exit(1)
+                        self.error('Syntax error: unexpected chars at end of program!')
+
+                    with self.phase('optimize'):
+                        for optimization in self.passes:
+                            self.code = optimization.optimize(self.code)
+
+                    with self.phase('emit'):
+                        self.write_code()
                 else:
                     self.error('syntax error')
             else:
@@ -122,15 +333,15 @@ class Parser:
             self.error('syntax error')
 
     def n_block(self):
-        print_rule('N_BLOCK', 'N_VARDECPART N_PROCDECPART N_STMTPART')
+        self.rule('N_BLOCK', 'N_VARDECPART N_PROCDECPART N_STMTPART')
 
         self.n_var_dec_part()
 
         if len(self.procs) == 1:
-            print('  init L.0, 20, L.1, L.2, L.3')
-            print('L.0:')
-            print(f'  bss {self.procs[0].frame_size}')
-            print('L.2:')
+            self.emit(INIT, 20)
+            self.code.label(0)
+            self.emit(BSS, self.procs[0].frame_size)
+            self.code.label(2)
 
         self.n_proc_dec_part()
         self.n_stmt_part()
@@ -139,7 +350,7 @@ class Parser:
 
     def n_var_dec_part(self):
         if self.token == 'T_VAR':
-            print_rule('N_VARDECPART', 'T_VAR N_VARDEC T_SCOLON N_VARDECLST')
+            self.rule('N_VARDECPART', 'T_VAR N_VARDEC T_SCOLON N_VARDECLST')
 
             self.get_token()
             self.n_var_dec()
@@ -150,23 +361,23 @@ class Parser:
             else:
                 self.error('syntax error')
         else:
-            print_rule('N_VARDECPART', 'epsilon')
+            self.rule('N_VARDECPART', 'epsilon')
 
+    # List rules loop rather than recurse, so long lists don't grow the stack
     def n_var_dec_lst(self):
-        if self.token == 'T_IDENT':
-            print_rule('N_VARDECLST', 'N_VARDEC T_SCOLON N_VARDECLST')
+        while self.token == 'T_IDENT':
+            self.rule('N_VARDECLST', 'N_VARDEC T_SCOLON N_VARDECLST')
             self.n_var_dec()
 
             if self.token == 'T_SCOLON':
                 self.get_token()
-                self.n_var_dec_lst()
             else:
                 self.error('syntax error')
-        else:
-            print_rule('N_VARDECLST', 'epsilon')
+
+        self.rule('N_VARDECLST', 'epsilon')
 
     def n_var_dec(self):
-        print_rule('N_VARDEC', 'N_IDENT N_IDENTLST T_COLON N_TYPE')
+        self.rule('N_VARDEC', 'N_IDENT N_IDENTLST T_COLON N_TYPE')
 
         # Append first identifier to temporary list
         self.temp_idents.append(self.n_ident())
@@ -189,8 +400,23 @@ class Parser:
         else:
             self.error('syntax error')
 
+    # n_var_dec of a check, which skips a broken declaration up to its ';'
+    # and supplies the ';' if it is missing
+    def n_var_dec_recovering(self):
+        try:
+            Parser.n_var_dec(self)
+        except CompileError as e:
+            self.temp_idents = []
+            self.recover(e, VARDEC_SYNC)
+        else:
+            if self.token in ('T_IDENT', 'T_PROC', 'T_BEGIN'):
+                self.record(self.located('syntax error'))
+
+        if self.token != 'T_SCOLON':
+            self.insert('T_SCOLON', ';')
+
     def n_ident(self):
-        print_rule('N_IDENT', 'T_IDENT')
+        self.rule('N_IDENT', 'T_IDENT')
 
         if self.token == 'T_IDENT':
             name = self.lexeme
@@ -201,27 +427,25 @@ class Parser:
             self.error('syntax error')
 
     def n_ident_lst(self):
-        if self.token == 'T_COMMA':
-            print_rule('N_IDENTLST', 'T_COMMA N_IDENT N_IDENTLST')
+        while self.token == 'T_COMMA':
+            self.rule('N_IDENTLST', 'T_COMMA N_IDENT N_IDENTLST')
 
             self.get_token()
 
             # Add additional identifiers to temporary list
             self.temp_idents.append(self.n_ident())
 
-            self.n_ident_lst()
-        else:
-            print_rule('N_IDENTLST', 'epsilon')
+        self.rule('N_IDENTLST', 'epsilon')
 
     def n_type(self):
         bounds = None
         base_type = None
 
         if self.token in ('T_INT', 'T_CHAR', 'T_BOOL'):
-            print_rule('N_TYPE', 'N_SIMPLE')
+            self.rule('N_TYPE', 'N_SIMPLE')
             var_type = self.n_simple()
         elif self.token == 'T_ARRAY':
-            print_rule('N_TYPE', 'N_ARRAY')
+            self.rule('N_TYPE', 'N_ARRAY')
             var_type = 'ARRAY'
             bounds, base_type = self.n_array()
         else:
@@ -230,7 +454,7 @@ class Parser:
         return var_type, bounds, base_type
 
     def n_array(self):
-        print_rule('N_ARRAY', 'T_ARRAY T_LBRACK N_IDXRANGE T_RBRACK T_OF N_SIMPLE')
+        self.rule('N_ARRAY', 'T_ARRAY T_LBRACK N_IDXRANGE T_RBRACK T_OF N_SIMPLE')
 
         if self.token == 'T_ARRAY':
             self.get_token()
@@ -257,7 +481,7 @@ class Parser:
             self.error('syntax error')
 
     def n_idx(self):
-        print_rule('N_IDX', 'T_INTCONST')
+        self.rule('N_IDX', 'T_INTCONST')
 
         if self.token == 'T_INTCONST':
             bound = self.lexeme
@@ -268,7 +492,7 @@ class Parser:
             self.error('syntax error')
 
     def n_idx_range(self):
-        print_rule('N_IDXRANGE', 'N_IDX T_DOTDOT N_IDX')
+        self.rule('N_IDXRANGE', 'N_IDX T_DOTDOT N_IDX')
 
         left_bound = int(self.n_idx())
 
@@ -277,14 +501,14 @@ class Parser:
             right_bound = int(self.n_idx())
 
             if left_bound > right_bound:
-                self.error('Start index must be less than or equal to end index of array')
+                self.semantic_error('Start index must be less than or equal to end index of array')
 
             return left_bound, right_bound
         else:
             self.error('syntax error')
 
     def n_simple(self):
-        print_rule('N_SIMPLE', self.token)
+        self.rule('N_SIMPLE', self.token)
 
         if self.token in ('T_INT', 'T_CHAR', 'T_BOOL'):
             var_type = self.lexeme.upper()
@@ -295,30 +519,144 @@ class Parser:
             self.error('syntax error')
 
     def n_proc_dec_part(self):
-        if self.token == 'T_PROC':
-            print_rule('N_PROCDECPART', 'N_PROCDEC T_SCOLON N_PROCDECPART')
+        while self.token == 'T_PROC':
+            self.rule('N_PROCDECPART', 'N_PROCDEC T_SCOLON N_PROCDECPART')
             self.n_proc_dec()
 
             if self.token == 'T_SCOLON':
                 self.get_token()
-                self.n_proc_dec_part()
             else:
                 self.error('syntax error')
-        else:
-            print_rule('N_PROCDECPART', 'epsilon')
+
+        self.rule('N_PROCDECPART', 'epsilon')
 
     def n_proc_dec(self):
-        print_rule('N_PROCDEC', 'N_PROCHDR N_BLOCK')
+        self.rule('N_PROCDEC', 'N_PROCHDR N_BLOCK')
 
         self.n_proc_hdr()
 
+        if self.procedures is not None:
+            self.cached_block()
+            return
+
         # Open new scope
         self.open_scope()
 
         self.n_block()
 
+    # Compile the block of the procedure just declared, or reuse its code if
+    # neither its tokens nor the outer names it refers to have changed
+    def cached_block(self):
+        proc = self.procs[-1]
+        name = '.'.join(entry.name for entry in self.procs[1:])
+
+        tokens, complete, error = self.scan_block()
+        key = self.procedures.key(tokens, proc.level, self.fold_constants)
+        cached = self.procedures.get(key, self.matches) if complete else None
+
+        if cached:
+            self.splice(cached, proc)
+            self.reused.append(name)
+            self.procs.pop()
+            self.get_token()
+            return
+
+        self.rebuilt.append(name)
+
+        # Parse the scanned tokens as if they had never been read
+        self.tokens = self.replay(tokens[1:], error, self.tokens)
+
+        start = len(self.code)
+        comment_start = len(self.code.comments)
+        references = {}
+
+        self.references.append((self.symbols.depth, references))
+        self.open_scope()
+        self.n_block()
+        self.references.pop()
+
+        if not complete:
+            return
+
+        references = {name: (signature(entry), entry.label) for name, entry in references.items()}
+        self.procedures.put(key, CachedProcedure(
+            self.code, start, comment_start, proc.label, self.label_num-proc.label, references))
+
+    # Read the tokens of a procedure's block, from the current token through
+    # the end of its compound statement. Every nested procedure declaration
+    # and then the block itself ends with a compound statement, so the block
+    # ends once as many outermost begin/end pairs as open procedures have
+    # closed. Returns the list of tokens, whether the end was
+    # found and any lexical error that cut the scan short.
+    def scan_block(self):
+        token, lexeme, offset = self.token, self.lexeme, self.offset
+        tokens = []
+        procs = 1
+        depth = 0
+
+        try:
+            while token:
+                tokens.append((token, lexeme, offset))
+
+                if token == 'T_PROC':
+                    procs += 1
+                elif token == 'T_BEGIN':
+                    depth += 1
+                elif token == 'T_END':
+                    depth -= 1
+
+                    if depth == 0:
+                        procs -= 1
+                        if procs == 0:
+                            return tokens, True, None
+
+                token, lexeme, offset = next(self.tokens, (None, None, None))
+        except LexError as e:
+            return tokens, False, e
+
+        return tokens, False, None
+
+    # Yield scanned tokens again, then whatever the scan stopped at
+    def replay(self, tokens, error, rest):
+        yield from tokens
+
+        if error:
+            raise error
+
+        yield from rest
+
+    # Whether every outer name a cached procedure used still means the same
+    def matches(self, cached):
+        for name, (ident_signature, _) in cached.references.items():
+            ident = self.symbols.get(name)
+
+            if not ident or signature(ident) != ident_signature:
+                return False
+
+        return True
+
+    # Emit the cached code of a procedure with its labels renumbered
+    def splice(self, cached, proc):
+        labels = {}
+
+        for name, (_, label) in cached.references.items():
+            ident = self.symbols.get(name)
+
+            if self.references:
+                self.refer(ident)
+
+            if ident.var_type == 'PROCEDURE':
+                labels[label] = ident.label
+
+        offset = proc.label - cached.first_label
+        for label in range(cached.first_label, cached.first_label+cached.n_labels):
+            labels[label] = label + offset
+
+        cached.emit_into(self.code, labels)
+        self.label_num = proc.label + cached.n_labels
+
     def n_proc_hdr(self):
-        print_rule('N_PROCHDR', 'T_PROC T_IDENT T_SCOLON')
+        self.rule('N_PROCHDR', 'T_PROC T_IDENT T_SCOLON')
 
         if self.token == 'T_PROC':
             self.get_token()
@@ -344,36 +682,36 @@ class Parser:
             self.error('syntax error')
 
     def n_stmt_part(self):
-        print_rule('N_STMTPART', 'N_COMPOUND')
+        self.rule('N_STMTPART', 'N_COMPOUND')
 
         proc = self.procs[-1]
 
-        print(f'{proc.label}:')
+        self.code.label(proc.label)
 
         if proc.var_type == 'PROCEDURE':
-            print(f'  save {proc.level}, 0')
+            self.emit(SAVE, proc.level, 0)
 
             if proc.frame_size > 0:
-                print(f'  asp {proc.frame_size}')
+                self.emit(ASP, proc.frame_size)
 
-        print("# Beginning of block's N_STMTPART")
+        self.code.comment("Beginning of block's N_STMTPART")
 
         self.n_compound()
 
         if proc.var_type == 'PROCEDURE':
             if proc.frame_size > 0:
-                print(f'  asp {-proc.frame_size}')
-            print('  ji')
+                self.emit(ASP, -proc.frame_size)
+            self.emit(JI)
         else:
-            print('  halt')
-            print('L.1:')
-            print('  bss 500')
-            print('  end')
+            self.emit(HALT)
+            self.code.label(1)
+            self.emit(BSS, 500)
+            self.emit(END)
 
         self.procs.pop()
 
     def n_compound(self):
-        print_rule('N_COMPOUND', 'T_BEGIN N_STMT N_STMTLST T_END')
+        self.rule('N_COMPOUND', 'T_BEGIN N_STMT N_STMTLST T_END')
 
         if self.token == 'T_BEGIN':
             self.get_token()
@@ -388,14 +726,32 @@ class Parser:
             self.error('syntax error')
 
     def n_stmt_lst(self):
-        if self.token == 'T_SCOLON':
-            print_rule('N_STMTLST', 'T_SCOLON N_STMT N_STMTLST')
+        while self.token == 'T_SCOLON':
+            self.rule('N_STMTLST', 'T_SCOLON N_STMT N_STMTLST')
 
             self.get_token()
             self.n_stmt()
-            self.n_stmt_lst()
-        else:
-            print_rule('N_STMTLST', 'epsilon')
+
+        self.rule('N_STMTLST', 'epsilon')
+
+    # n_stmt_lst of a check, which also takes a statement straight after
+    # another as one missing the ';' between them, and skips anything else
+    # a statement is followed by up to where the list can go on
+    def n_stmt_lst_recovering(self):
+        Parser.n_stmt_lst(self)
+
+        while self.token not in ('T_END', 'T_DOT', None):
+            self.record(self.located('syntax error'))
+
+            if self.token not in STMT_FIRST:
+                self.get_token()
+                while self.token not in STMT_SYNC:
+                    self.get_token()
+
+            if self.token in STMT_FIRST:
+                self.n_stmt()
+
+            Parser.n_stmt_lst(self)
 
     def n_stmt(self):
         if self.token == 'T_IDENT':
@@ -403,64 +759,77 @@ class Parser:
 
             if ident.var_type == 'PROCEDURE':
                 for i in range(self.procs[-1].level, ident.level-1, -1):
-                    print(f'  push {i}, 0')
+                    self.emit(PUSH, i, 0)
 
-                print(f'  js {ident.label}')
+                self.emit(JS, ident.label)
 
                 for i in range(ident.level, self.procs[-1].level+1):
-                    print(f'  pop {i}, 0')
+                    self.emit(POP, i, 0)
 
-                print_rule('N_STMT', 'N_PROCSTMT')
+                self.rule('N_STMT', 'N_PROCSTMT')
                 self.n_proc_stmt()
             else:
-                print_rule('N_STMT', 'N_ASSIGN')
+                self.rule('N_STMT', 'N_ASSIGN')
                 self.n_assign()
         elif self.token == 'T_READ':
-            print_rule('N_STMT', 'N_READ')
+            self.rule('N_STMT', 'N_READ')
             self.n_read()
         elif self.token == 'T_WRITE':
-            print_rule('N_STMT', 'N_WRITE')
+            self.rule('N_STMT', 'N_WRITE')
             self.n_write()
         elif self.token == 'T_IF':
-            print_rule('N_STMT', 'N_CONDITION')
+            self.rule('N_STMT', 'N_CONDITION')
             self.n_condition()
         elif self.token == 'T_WHILE':
-            print_rule('N_STMT', 'N_WHILE')
+            self.rule('N_STMT', 'N_WHILE')
             self.n_while()
         elif self.token == 'T_BEGIN':
-            print_rule('N_STMT', 'N_COMPOUND')
+            self.rule('N_STMT', 'N_COMPOUND')
             self.n_compound()
         else:
             self.error('syntax error')
 
+    # n_stmt of a check. A statement that fails to parse is skipped up to
+    # where a statement may end, or up to a compound statement, which is
+    # then parsed in its place.
+    def n_stmt_recovering(self):
+        try:
+            Parser.n_stmt(self)
+        except CompileError as e:
+            self.recover(e, STMT_SYNC)
+
+            if self.token == 'T_BEGIN':
+                self.n_stmt()
+
     def n_assign(self):
-        print_rule('N_ASSIGN', 'N_VARIABLE T_ASSIGN N_EXPR')
+        self.rule('N_ASSIGN', 'N_VARIABLE T_ASSIGN N_EXPR')
 
         var_type = self.n_variable()
         if var_type == 'ARRAY':
-            self.error('Array variable must be indexed')
+            self.semantic_error('Array variable must be indexed')
 
         if self.token == 'T_ASSIGN':
             self.get_token()
 
             expr_type = self.n_expr()
-            print('  st')
+            self.emit(ST)
 
             if expr_type == 'ARRAY':
-                self.error('Array variable must be indexed')
-            elif expr_type == 'PROCEDURE':
-                self.error('Procedure/variable mismatch')
+                self.semantic_error('Array variable must be indexed')
+            elif 'PROCEDURE' in (var_type, expr_type):
+                # Already reported by n_variable
+                pass
             elif var_type != expr_type:
-                self.error('Expression must be of same type as variable')
+                self.semantic_error('Expression must be of same type as variable')
         else:
             self.error('syntax error')
 
     def n_proc_stmt(self):
-        print_rule('N_PROCSTMT', 'N_PROCIDENT')
+        self.rule('N_PROCSTMT', 'N_PROCIDENT')
         self.n_proc_ident()
 
     def n_proc_ident(self):
-        print_rule('N_PROCIDENT', 'T_IDENT')
+        self.rule('N_PROCIDENT', 'T_IDENT')
 
         if self.token == 'T_IDENT':
             self.get_token()
@@ -468,7 +837,7 @@ class Parser:
             self.error('syntax error')
 
     def n_read(self):
-        print_rule('N_READ', 'T_READ T_LPAREN N_INPUTVAR N_INPUTLST T_RPAREN')
+        self.rule('N_READ', 'T_READ T_LPAREN N_INPUTVAR N_INPUTLST T_RPAREN')
 
         if self.token == 'T_READ':
             self.get_token()
@@ -488,30 +857,29 @@ class Parser:
             self.error('syntax error')
 
     def n_input_lst(self):
-        if self.token == 'T_COMMA':
-            print_rule('N_INPUTLST', 'T_COMMA N_INPUTVAR N_INPUTLST')
+        while self.token == 'T_COMMA':
+            self.rule('N_INPUTLST', 'T_COMMA N_INPUTVAR N_INPUTLST')
 
             self.get_token()
             self.n_input_var()
-            self.n_input_lst()
-        else:
-            print_rule('N_INPUTLST', 'epsilon')
+
+        self.rule('N_INPUTLST', 'epsilon')
 
     def n_input_var(self):
-        print_rule('N_INPUTVAR', 'N_VARIABLE')
+        self.rule('N_INPUTVAR', 'N_VARIABLE')
 
         var_type = self.n_variable()
         if var_type == 'INTEGER':
-            print('  iread')
+            self.emit(IREAD)
         elif var_type == 'CHAR':
-            print('  cread')
+            self.emit(CREAD)
         else:
-            self.error('Input variable must be of type integer or char')
+            self.semantic_error('Input variable must be of type integer or char')
 
-        print('  st')
+        self.emit(ST)
 
     def n_write(self):
-        print_rule('N_WRITE', 'T_WRITE T_LPAREN N_OUTPUT N_OUTPUTLST T_RPAREN')
+        self.rule('N_WRITE', 'T_WRITE T_LPAREN N_OUTPUT N_OUTPUTLST T_RPAREN')
 
         if self.token == 'T_WRITE':
             self.get_token()
@@ -531,29 +899,28 @@ class Parser:
             self.error('syntax error')
 
     def n_output_lst(self):
-        if self.token == 'T_COMMA':
-            print_rule('N_OUTPUTLST', 'T_COMMA N_OUTPUT N_OUTPUTLST')
+        while self.token == 'T_COMMA':
+            self.rule('N_OUTPUTLST', 'T_COMMA N_OUTPUT N_OUTPUTLST')
 
             self.get_token()
             self.n_output()
-            self.n_output_lst()
-        else:
-            print_rule('N_OUTPUTLST', 'epsilon')
+
+        self.rule('N_OUTPUTLST', 'epsilon')
 
     def n_output(self):
-        print_rule('N_OUTPUT', 'N_EXPR')
+        self.rule('N_OUTPUT', 'N_EXPR')
 
         expr_type = self.n_expr()
 
         if expr_type == 'INTEGER':
-            print('  iwrite')
+            self.emit(IWRITE)
         elif expr_type == 'CHAR':
-            print('  cwrite')
+            self.emit(CWRITE)
         else:
-            self.error('Output expression must be of type integer or char')
+            self.semantic_error('Output expression must be of type integer or char')
 
     def n_condition(self):
-        print_rule('N_CONDITION', 'T_IF N_EXPR T_THEN N_STMT N_ELSEPART')
+        self.rule('N_CONDITION', 'T_IF N_EXPR T_THEN N_STMT N_ELSEPART')
 
         if self.token == 'T_IF':
             self.get_token()
@@ -561,21 +928,21 @@ class Parser:
 
             else_label = self.new_label()
             post_label = self.new_label()
-            print(f'  jf {else_label}')
+            self.emit(JF, else_label)
 
             if expr_type != 'BOOLEAN':
-                self.error('Expression must be of type boolean')
+                self.semantic_error('Expression must be of type boolean')
 
             if self.token == 'T_THEN':
                 self.get_token()
                 self.n_stmt()
 
-                print(f'  jp {post_label}')
-                print(f'{else_label}:')
+                self.emit(JP, post_label)
+                self.code.label(else_label)
 
                 self.n_else_part()
 
-                print(f'{post_label}:')
+                self.code.label(post_label)
             else:
                 self.error('syntax error')
         else:
@@ -583,136 +950,158 @@ class Parser:
 
     def n_else_part(self):
         if self.token == 'T_ELSE':
-            print_rule('N_ELSEPART', 'T_ELSE N_STMT')
+            self.rule('N_ELSEPART', 'T_ELSE N_STMT')
 
             self.get_token()
             self.n_stmt()
         else:
-            print_rule('N_ELSEPART', 'epsilon')
+            self.rule('N_ELSEPART', 'epsilon')
 
     def n_while(self):
-        print_rule('N_WHILE', 'T_WHILE N_EXPR T_DO N_STMT')
+        self.rule('N_WHILE', 'T_WHILE N_EXPR T_DO N_STMT')
 
         if self.token == 'T_WHILE':
             self.get_token()
 
             top_label = self.new_label()
-            print(f'{top_label}:')
+            self.code.label(top_label)
 
             expr_type = self.n_expr()
 
             if expr_type != 'BOOLEAN':
-                self.error('Expression must be of type boolean')
+                self.semantic_error('Expression must be of type boolean')
 
             if self.token == 'T_DO':
                 self.get_token()
 
                 post_label = self.new_label()
-                print(f'  jf {post_label}')
+                self.emit(JF, post_label)
 
                 self.n_stmt()
 
-                print(f'  jp {top_label}')
-                print(f'{post_label}:')
+                self.emit(JP, top_label)
+                self.code.label(post_label)
             else:
                 self.error('syntax error')
         else:
             self.error('syntax error')
 
     def n_expr(self):
-        print_rule('N_EXPR', 'N_SIMPLEEXPR N_OPEXPR')
+        self.rule('N_EXPR', 'N_SIMPLEEXPR N_OPEXPR')
 
+        start = len(self.code)
         simple_type = self.n_simple_expr()
         op_info = self.n_op_expr()
 
         if op_info:
             op_type, op = op_info
             if op_type != simple_type:
-                self.error('Expressions must both be int, or both char, or both boolean')
+                self.semantic_error('Expressions must both be int, or both char, or both boolean')
+
+            self.emit(REL_OPS[op])
+            self.fold(start)
 
-            print(f'  .{op[2:].lower()}.')
             return 'BOOLEAN'
         else:
             return simple_type
 
     def n_op_expr(self):
         if self.token in ('T_LT', 'T_LE', 'T_NE', 'T_EQ', 'T_GT', 'T_GE'):
-            print_rule('N_OPEXPR', 'N_RELOP N_SIMPLEEXPR')
+            self.rule('N_OPEXPR', 'N_RELOP N_SIMPLEEXPR')
 
             op = self.n_rel_op()
             simple_type = self.n_simple_expr()
 
             return simple_type, op
         else:
-            print_rule('N_OPEXPR', 'epsilon')
+            self.rule('N_OPEXPR', 'epsilon')
 
     def n_simple_expr(self):
-        print_rule('N_SIMPLEEXPR', 'N_TERM N_ADDOPLST')
+        self.rule('N_SIMPLEEXPR', 'N_TERM N_ADDOPLST')
+        start = len(self.code)
         term_type = self.n_term()
-        self.n_add_op_lst()
+        self.n_add_op_lst(start)
 
         return term_type
 
-    def n_add_op_lst(self):
-        if self.token in ('T_PLUS', 'T_MINUS', 'T_OR'):
-            print_rule('N_ADDOPLST', 'N_ADDOP N_TERM N_ADDOPLST')
+    # Every term is emitted first and the operators follow in reverse, so
+    # they apply right to left. Each operator waits on an explicit stack
+    # along with where its left operand starts, for folding.
+    def n_add_op_lst(self, start):
+        pending = []
+
+        while self.token in ('T_PLUS', 'T_MINUS', 'T_OR'):
+            self.rule('N_ADDOPLST', 'N_ADDOP N_TERM N_ADDOPLST')
 
             op = self.n_add_op()
+            pending.append((op, start))
+
+            start = len(self.code)
             self.n_term()
-            self.n_add_op_lst()
-            print(f'  {op}')
-        else:
-            print_rule('N_ADDOPLST', 'epsilon')
+
+        self.rule('N_ADDOPLST', 'epsilon')
+
+        while pending:
+            op, start = pending.pop()
+            self.emit(op)
+            self.fold(start)
 
     def n_term(self):
-        print_rule('N_TERM', 'N_FACTOR N_MULTOPLST')
+        self.rule('N_TERM', 'N_FACTOR N_MULTOPLST')
 
+        start = len(self.code)
         factor_type = self.n_factor()
-        self.n_mult_op_lst()
+        self.n_mult_op_lst(start)
 
         return factor_type
 
-    def n_mult_op_lst(self):
+    def n_mult_op_lst(self, start):
         if self.token in ('T_MULT', 'T_DIV', 'T_AND'):
-            print_rule('N_MULTOPLST', 'N_MULTOP N_FACTOR N_MULTOPLST')
+            self.rule('N_MULTOPLST', 'N_MULTOP N_FACTOR N_MULTOPLST')
             op = self.token
 
             is_arithmatic = self.n_mult_op()
+            factor_start = len(self.code)
             factor_type = self.n_factor()
 
-            print(f'  {op[2:].lower()}')
+            if op == 'T_DIV' and self.constant(factor_start) == 0:
+                self.semantic_error('Division by zero')
+
+            self.emit(MULT_OPS[op])
 
             if is_arithmatic and factor_type != 'INTEGER':
-                self.error('Expression must be of type integer')
+                self.semantic_error('Expression must be of type integer')
+
+            self.fold(start)
 
             return factor_type
         else:
-            print_rule('N_MULTOPLST', 'epsilon')
+            self.rule('N_MULTOPLST', 'epsilon')
 
     def n_factor(self):
         if self.token in ('T_PLUS', 'T_MINUS', 'T_IDENT'):
-            print_rule('N_FACTOR', 'N_SIGN N_VARIABLE')
+            self.rule('N_FACTOR', 'N_SIGN N_VARIABLE')
 
             is_signed = self.n_sign()
             var_type = self.n_variable()
 
-            print('  deref')
+            self.emit(DEREF)
 
             if is_signed:
                 if var_type != 'INTEGER':
-                    self.error('Expression must be of type integer')
+                    self.semantic_error('Expression must be of type integer')
 
-                print('  neg')
+                self.emit(NEG)
 
             return var_type
         elif self.token in ('T_INTCONST', 'T_CHARCONST', 'T_TRUE', 'T_FALSE'):
-            print_rule('N_FACTOR', 'N_CONST')
+            self.rule('N_FACTOR', 'N_CONST')
 
             const_type = self.n_const()
 
             return const_type
         elif self.token == 'T_LPAREN':
-            print_rule('N_FACTOR', 'T_LPAREN N_EXPR T_RPAREN')
+            self.rule('N_FACTOR', 'T_LPAREN N_EXPR T_RPAREN')
 
             self.get_token()
             expr_type = self.n_expr()
@@ -724,15 +1113,18 @@ class Parser:
 
             return expr_type
         elif self.token == 'T_NOT':
-            print_rule('N_FACTOR', 'T_NOT N_FACTOR')
+            self.rule('N_FACTOR', 'T_NOT N_FACTOR')
 
             self.get_token()
+            start = len(self.code)
             factor_type = self.n_factor()
 
-            print('  not')
+            self.emit(NOT)
 
             if factor_type != 'BOOLEAN':
-                self.error('Expression must be of type boolean')
+                self.semantic_error('Expression must be of type boolean')
+
+            self.fold(start)
 
             return "BOOLEAN"
         else:
@@ -741,35 +1133,37 @@ class Parser:
     # Return True if signed, False otherwise
     def n_sign(self):
         if self.token in ('T_PLUS', 'T_MINUS'):
-            print_rule('N_SIGN', self.token)
+            self.rule('N_SIGN', self.token)
             self.get_token()
 
             return True
         else:
-            print_rule('N_SIGN', 'epsilon')
+            self.rule('N_SIGN', 'epsilon')
 
             return False
 
-    # Return True if arithmatic operator, False otherwise
+    # Return opcode of operator
     def n_add_op(self):
-        print_rule('N_ADDOP', self.token)
+        self.rule('N_ADDOP', self.token)
 
         if self.token == 'T_PLUS':
             self.get_token()
 
-            return 'add'
+            return ADD
         elif self.token == 'T_MINUS':
             self.get_token()
             
-            return 'sub'
+            return SUB
         elif self.token == 'T_OR':
             self.get_token()
+
+            return OR
         else:
             self.error('syntax error')
 
     # Return True if arithmatic operator, False otherwise
     def n_mult_op(self):
-        print_rule('N_MULTOP', self.token)
+        self.rule('N_MULTOP', self.token)
 
         if self.token in ('T_MULT', 'T_DIV'):
             self.get_token()
@@ -783,7 +1177,7 @@ class Parser:
             self.error('syntax error')
 
     def n_rel_op(self):
-        print_rule('N_RELOP', self.token)
+        self.rule('N_RELOP', self.token)
 
         if self.token in ('T_LT', 'T_LE', 'T_NE', 'T_EQ', 'T_GT', 'T_GE'):
             op = self.token
@@ -794,20 +1188,28 @@ class Parser:
             self.error('syntax error')
 
     def n_variable(self):
-        print_rule('N_VARIABLE', 'T_IDENT N_IDXVAR')
+        self.rule('N_VARIABLE', 'T_IDENT N_IDXVAR')
 
         if self.token == 'T_IDENT':
             # Search for identifier in scope
             ident = self.search_id(self.lexeme)
 
+            if ident.var_type in ('PROCEDURE', 'PROGRAM'):
+                # Has no cells to address, so in a check the rest is read without code
+                self.semantic_error('Procedure/variable mismatch')
+                self.get_token()
+                self.n_idx_var()
+
+                return 'PROCEDURE'
+
             self.get_token()
             if ident.var_type != 'ARRAY':
                 if self.token == 'T_LBRACK':
-                    self.error('Indexed variable must be of array type')
+                    self.semantic_error('Indexed variable must be of array type')
 
-                print(f'  la {ident.offset}, {ident.level}')
+                self.emit(LA, ident.offset, ident.level)
             else:
-                print(f'  la {ident.offset-ident.bounds[0]}, {ident.level}')
+                self.emit(LA, ident.offset-ident.bounds[0], ident.level)
 
             is_indexed = self.n_idx_var()
 
@@ -819,17 +1221,18 @@ class Parser:
     # Return True if indexed, False otherwise
     def n_idx_var(self):
         if self.token == 'T_LBRACK':
-            print_rule('N_IDXVAR', 'T_LBRACK N_EXPR T_RBRACK')
+            self.rule('N_IDXVAR', 'T_LBRACK N_EXPR T_RBRACK')
 
             self.get_token()
             expr_type = self.n_expr()
 
-            print('  add')
+            self.emit(ADD)
 
             if expr_type == 'PROCEDURE':
-                self.error('Procedure/variable mismatch')
+                # Already reported by n_variable
+                pass
             elif expr_type != 'INTEGER':
-                self.error('Index expression must be of type integer')
+                self.semantic_error('Index expression must be of type integer')
 
             if self.token == 'T_RBRACK':
                 self.get_token()
@@ -838,25 +1241,25 @@ class Parser:
 
             return True
         else:
-            print_rule('N_IDXVAR', 'epsilon')
+            self.rule('N_IDXVAR', 'epsilon')
 
             return False
 
     def n_const(self):
         if self.token == 'T_INTCONST':
-            print_rule('N_CONST', self.token)
-            print(f'  lc {self.lexeme}')
+            self.rule('N_CONST', self.token)
+            self.emit(LC, int(self.lexeme))
             self.get_token()
 
             return 'INTEGER'
         elif self.token == 'T_CHARCONST':
-            print_rule('N_CONST', self.token)
-            print(f'  lc {ord(self.lexeme[1])}')
+            self.rule('N_CONST', self.token)
+            self.emit(LC, ord(self.lexeme[1]))
             self.get_token()
 
             return 'CHAR'
         elif self.token in ('T_TRUE', 'T_FALSE'):
-            print_rule('N_CONST', 'N_BOOLCONST')
+            self.rule('N_CONST', 'N_BOOLCONST')
             self.n_bool_const()
 
             return 'BOOLEAN'
@@ -864,30 +1267,251 @@ class Parser:
             self.error('syntax error')
 
     def n_bool_const(self):
-        print_rule('N_BOOLCONST', self.token)
+        self.rule('N_BOOLCONST', self.token)
 
         if self.token == 'T_TRUE':
-            print('  lc 1')
+            self.emit(LC, 1)
             self.get_token()
         elif self.token == 'T_FALSE':
-            print('  lc 0')
+            self.emit(LC, 0)
             self.get_token()
         else:
             self.error('syntax error')
 
 
 def print_rule(lhs, rhs):
-    if DEBUG:
-        print(f'{lhs} -> {rhs}')
+    print(f'{lhs} -> {rhs}')
 
 
-def main(input_filename):
-    with open(input_filename) as f:
-        parser = Parser(Lexer(f.read()))
+def print_entry(name, var_type, bounds, base_type):
+    print(f'\n+++ Adding {name} to symbol table with type {var_type}', end='')
+
+    # If array
+    if bounds and base_type:
+        print(' {} .. {} OF {}'.format(*bounds, base_type))
+    else:
+        print()
+
+
+# Hooks bound in place of tracing that is turned off. The one standing in
+# for print_rule, called on every production, takes its arguments as they
+# are rather than packing them into a tuple.
+def no_rule(lhs, rhs):
+    pass
+
+
+def no_trace(*args):
+    pass
+
+
+# Outcome of compiling one program
+class CompileResult:
+    def __init__(self, code, diagnostics, stats):
+        self.code = code                # Code buffer of the finished program
+        self.diagnostics = diagnostics  # Reports from optimization passes
+        self.stats = stats              # Counts describing the compile
 
+    @property
+    def text(self):
+        return self.code.text()
+
+
+# Compile a MIPL program given as source text, a path or an open file. The
+# code is also written to emitter, if given, as it would be by the CLI,
+# including the code generated before an error. With a ProcedureCache,
+# procedures unchanged since an earlier compile through the same cache
+# reuse their code. Given inline, procedures of at most that many
+# instructions that call none are inlined at their call sites, before any
+# other optimization. Raises CompileError (or its subclass LexError) for an
+# invalid program.
+def compile_source(source, optimize=False, emitter=None, procedures=None, stats=None, verbosity=QUIET, inline=None):
+    sink = CodeSink()
+    passes = [Inliner(inline)] if inline is not None else []
+    passes += [DeadCode(), DisplaySaves(), TailCalls(), Peephole(), Layout()] if optimize else []
+    start = time.perf_counter()
+
+    lexer = Lexer(source, trace_tokens=verbosity >= TOKENS)
+    parser = Parser(lexer, emitter if emitter else Emitter(sink), passes, optimize, procedures, stats, verbosity)
     parser.get_token() # Initialize with first token
     parser.n_prog()
 
+    if stats:
+        stats.finish(parser.code, parser.label_num - FIRST_LABEL, time.perf_counter() - start)
+
+    code = parser.code
+    stats = {
+        'lines': parser.lexer.lines,
+        'instructions': count_instructions(code),
+        'labels': len(code.labels),
+        'removed': sum(optimization.removed for optimization in passes),
+    }
+    diagnostics = [optimization.summary() for optimization in passes]
+
+    if procedures is not None:
+        stats['rebuilt'] = parser.rebuilt
+        stats['reused'] = parser.reused
+
+    if parser.rebuilt or parser.reused:
+        diagnostics.append(f'incremental: rebuilt {len(parser.rebuilt)} procedures ({", ".join(parser.rebuilt) or "none"}), '
+                           f'reused {len(parser.reused)}')
+
+    return CompileResult(code, diagnostics, stats)
+
+
+# Check a MIPL program without writing any code, recovering from errors to
+# find as many as it can, up to max_errors, in one pass. Returns the errors
+# in the order they appear in the source.
+def check_source(source, max_errors=MAX_ERRORS, verbosity=QUIET):
+    errors = []
+    lexer = Lexer(source, trace_tokens=verbosity >= TOKENS, errors=errors)
+    parser = Parser(lexer, Emitter(CodeSink()), verbosity=verbosity, errors=errors, max_errors=max_errors)
+
+    try:
+        parser.get_token() # Initialize with first token
+        parser.n_prog()
+    except CompileError as e:
+        # No rule could recover from it, so the check ends here
+        errors.append(e)
+    except ErrorLimit:
+        pass
+
+    errors.sort(key=lambda error: (error.line, error.column))
+
+    return errors[:max_errors]
+
+
+def main(input_filename, output_filename=None, binary=False, optimize=False, cache_dir=None, cache_size=CACHE_SIZE,
+         stats_format=None, verbosity=QUIET, inline=None):
+    if binary:
+        sink = ImageSink(output_filename)
+    else:
+        sink = FileSink(output_filename) if output_filename else StdoutSink()
+
+    emitter = Emitter(sink)
+    cache = CompileCache(cache_dir, cache_size) if cache_dir else None
+    stats = CompileStats() if stats_format else None
+
+    # Tokenize straight from the file rather than reading it all up front,
+    # unless the whole source is needed to look it up in the cache
+    try:
+        with open(input_filename) as f:
+            if cache:
+                source = f.read()
+                key = cache.key(source, optimize, inline)
+
+                # Statistics and traces are taken while compiling, so asking
+                # for them always compiles, though the code is still cached
+                text = cache.get(key) if not stats and verbosity == QUIET else None
+
+                if text is not None:
+                    if binary:
+                        emitter.emit_code(parse_code(text))
+                    else:
+                        for line in text.splitlines():
+                            emitter.emit(line)
+
+                    print(cache.summary(), file=sys.stderr)
+                    return
+
+                result = compile_source(source, optimize, emitter, stats=stats, verbosity=verbosity, inline=inline)
+                cache.put(key, result.text)
+            else:
+                result = compile_source(f, optimize, emitter, stats=stats, verbosity=verbosity, inline=inline)
+    except CompileError as e:
+        emitter.flush()
+        print(e)
+        sys.exit(1)
+    finally:
+        emitter.close()
+
+    for diagnostic in result.diagnostics:
+        print(diagnostic, file=sys.stderr)
+
+    if cache and (stats or verbosity > QUIET):
+        print('cache: not looked up, since statistics and traces need a compile', file=sys.stderr)
+    elif cache:
+        print(cache.summary(), file=sys.stderr)
+
+    if stats_format == 'json':
+        print(json.dumps(stats.as_dict(), indent=2), file=sys.stderr)
+    elif stats_format:
+        print(stats.summary(), file=sys.stderr)
+
+
+def check(input_filename, max_errors=MAX_ERRORS, verbosity=QUIET):
+    with open(input_filename) as f:
+        errors = check_source(f, max_errors, verbosity)
+
+    for error in errors:
+        print(error)
+
+    if errors:
+        limit = ' (stopped at the limit)' if len(errors) >= max_errors else ''
+        print(f'check: {len(errors)} errors{limit}', file=sys.stderr)
+        sys.exit(1)
+
 
 if __name__ == '__main__':
-    main(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(description='Compile a MIPL program to OAL.')
+    arg_parser.add_argument('input', nargs='?', help='MIPL source file')
+    arg_parser.add_argument('-o', '--output', help='write OAL code here instead of stdout (with --batch, the output directory)')
+    arg_parser.add_argument('-b', '--binary', action='store_true', help='write a binary OAL image (requires -o)')
+    arg_parser.add_argument('-O', '--optimize', action='store_true', help='fold constant expressions and run the peephole optimizer')
+    arg_parser.add_argument('--inline', metavar='N', nargs='?', type=int, const=INLINE_SIZE,
+                            help='inline procedures of at most N instructions that call no others (default N: %(const)s)')
+    arg_parser.add_argument('-v', '--verbose', action='count', default=QUIET,
+                            help='trace grammar rules, then symbol table changes (-vv), then tokens (-vvv)')
+    arg_parser.add_argument('--stats', nargs='?', const='text', choices=('text', 'json'),
+                            help='report compiler statistics on stderr, as a summary (default) or JSON')
+    arg_parser.add_argument('--check', action='store_true', help='report every error in the program without writing any code')
+    arg_parser.add_argument('--max-errors', metavar='N', type=int, default=MAX_ERRORS, help='with --check, errors reported before giving up (default: %(default)s)')
+    arg_parser.add_argument('--batch', metavar='DIR', help='compile every file in DIR to NAME.oal files')
+    arg_parser.add_argument('--serve', metavar='SOCKET', help='run a compile server on a Unix socket (see client.py)')
+    arg_parser.add_argument('-j', '--jobs', type=int, help='worker processes for --batch or --serve (default: one per CPU)')
+    arg_parser.add_argument('--expected', metavar='DIR', help='with --batch, compare each output to DIR/NAME.oal')
+    arg_parser.add_argument('--cache', metavar='DIR', help='reuse code compiled earlier from the same source, kept in DIR')
+    arg_parser.add_argument('--cache-size', metavar='MB', type=int, default=CACHE_SIZE >> 20, help='cap on the size of the cache (default: %(default)s)')
+    args = arg_parser.parse_args()
+
+    if args.batch:
+        if args.input or args.binary:
+            arg_parser.error('--batch takes no input file or --binary')
+
+        # Imported here since the batch driver imports this module in turn
+        from batch import run_batch
+
+        fails = run_batch(args.batch, args.output or 'output', args.jobs, args.expected, args.optimize,
+                          args.cache, args.cache_size << 20, args.inline)
+        sys.exit(1 if fails else 0)
+
+    if args.serve:
+        if args.input or args.batch:
+            arg_parser.error('--serve takes no input file or --batch')
+        if args.inline is not None:
+            arg_parser.error('--serve takes no --inline; clients ask for it per request (client.py --inline)')
+
+        # Imported here since the server imports this module in turn
+        from server import serve
+
+        try:
+            serve(args.serve, args.jobs, args.cache, args.cache_size << 20)
+        except FileExistsError as e:
+            print(e, file=sys.stderr)
+            sys.exit(1)
+
+        sys.exit(0)
+
+    if not args.input:
+        arg_parser.error('an input file, --batch or --serve is required')
+
+    if args.max_errors < 1:
+        arg_parser.error('--max-errors must be at least 1')
+
+    if args.check:
+        check(args.input, args.max_errors, args.verbose)
+        sys.exit(0)
+
+    if args.binary and not args.output:
+        arg_parser.error('--binary requires -o')
+
+    main(args.input, args.output, args.binary, args.optimize, args.cache, args.cache_size << 20, args.stats, args.verbose, args.inline)
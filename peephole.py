@@ -0,0 +1,184 @@
+# Local imports
+from lexer import valid_integer
+from oal import (
+    Code, MNEMONICS, BINARY_OPS, UNARY_OPS, UNCONDITIONAL, RESERVED_LABELS,
+    LABEL, COMMENT, BSS, END, JS, JF, JP, LC,
+)
+
+# Instructions that never execute and so are never unreachable
+DIRECTIVES = frozenset((LABEL, COMMENT, BSS, END))
+
+
+# Rewrites code one instruction at a time. Each instruction is appended to
+# the output and the rules registered for its opcode are tried against the
+# tail of the output; a rule that fires rewrites the tail in place, and the
+# rules for the new last instruction are then tried in turn, so folds
+# cascade (lc 1, lc 2, lc 3, add, add becomes lc 6).
+class Peephole:
+    def __init__(self, rules=None):
+        self.rules = rules if rules else RULES
+        self.hits = {}          # Rule name -> times fired
+        self.removed = 0        # Instructions removed by the last optimize()
+
+    def optimize(self, code):
+        # Count references to every label so unused ones can be dropped
+        self.refs = refs = {}
+        for op, a in zip(code.ops, code.a):
+            if op in (JS, JF, JP):
+                refs[a] = refs.get(a, 0) + 1
+
+        out = []
+        for instruction in zip(code.ops, code.a, code.b):
+            out.append(instruction)
+            self.rewrite(out)
+
+        optimized = Code()
+        optimized.comments = code.comments
+
+        for op, a, b in out:
+            if op == LABEL:
+                optimized.label(a)
+            else:
+                optimized.emit(op, a, b)
+
+        self.removed = count_instructions(code) - count_instructions(optimized)
+
+        return optimized
+
+    def rewrite(self, out):
+        fired = True
+
+        while fired and out:
+            fired = False
+
+            for rule in self.rules.get(out[-1][0], ()):
+                if rule(self, out):
+                    self.hits[rule.__name__] = self.hits.get(rule.__name__, 0) + 1
+                    fired = True
+                    break
+
+    def unref(self, label):
+        self.refs[label] -= 1
+
+    def summary(self):
+        rules = ', '.join(f'{name} {count}' for name, count in sorted(self.hits.items()))
+        return f'peephole: removed {self.removed} instructions ({rules or "no rules fired"})'
+
+
+def count_instructions(code):
+    return sum(1 for op in code.ops if op not in (LABEL, COMMENT))
+
+
+def fits(value):
+    return value is not None and valid_integer(value)
+
+
+# lc x; lc y; op  ->  lc (x op y)
+def fold_binary(peephole, out):
+    if len(out) < 3 or out[-2][0] != LC or out[-3][0] != LC:
+        return False
+
+    value = BINARY_OPS[out[-1][0]](out[-3][1], out[-2][1])
+    if not fits(value):
+        return False
+
+    out[-3:] = [(LC, value, 0)]
+    return True
+
+
+# lc x; op  ->  lc (op x)
+def fold_unary(peephole, out):
+    if len(out) < 2 or out[-2][0] != LC:
+        return False
+
+    value = UNARY_OPS[out[-1][0]](out[-2][1])
+    if not fits(value):
+        return False
+
+    out[-2:] = [(LC, value, 0)]
+    return True
+
+
+# lc true; jf L  ->  (nothing)
+# lc false; jf L  ->  jp L
+def constant_branch(peephole, out):
+    if len(out) < 2 or out[-2][0] != LC:
+        return False
+
+    _, label, _ = out.pop()
+    _, value, _ = out.pop()
+
+    if value:
+        peephole.unref(label)
+    else:
+        out.append((JP, label, 0))
+
+    return True
+
+
+# jp L; [labels...] L:  ->  [labels...] L:
+def jump_to_next(peephole, out):
+    labels = set()
+    i = len(out) - 1
+
+    while i >= 0 and out[i][0] == LABEL:
+        labels.add(out[i][1])
+        i -= 1
+
+    if i < 0 or out[i][0] != JP or out[i][1] not in labels:
+        return False
+
+    peephole.unref(out[i][1])
+    del out[i]
+    return True
+
+
+# L: with no jump left to it  ->  (nothing)
+def unused_label(peephole, out):
+    label = out[-1][1]
+
+    if label in RESERVED_LABELS or peephole.refs.get(label, 0) > 0:
+        return False
+
+    out.pop()
+    return True
+
+
+# jp/ji/halt; op  ->  jp/ji/halt, when no label makes op reachable
+def unreachable(peephole, out):
+    i = len(out) - 2
+
+    while i >= 0 and out[i][0] == COMMENT:
+        i -= 1
+
+    if i < 0 or out[i][0] not in UNCONDITIONAL:
+        return False
+
+    op, a, _ = out.pop()
+    if op in (JS, JF, JP):
+        peephole.unref(a)
+
+    return True
+
+
+def build_rules():
+    rules = {}
+
+    def register(rule, *ops):
+        for op in ops:
+            rules.setdefault(op, []).append(rule)
+
+    executable = [op for op in range(len(MNEMONICS)) if op not in DIRECTIVES]
+
+    register(unreachable, *executable)
+    register(fold_binary, *BINARY_OPS)
+    register(fold_unary, *UNARY_OPS)
+    register(constant_branch, JF)
+    register(jump_to_next, LABEL)
+    register(unused_label, LABEL)
+
+    return rules
+
+
+# Rules to try, by opcode of the instruction just appended
+RULES = build_rules()
@@ -0,0 +1,168 @@
+import os
+import json
+import stat
+import signal
+import socket
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+
+# Local imports
+from lexer import CompileError
+from parser import compile_source
+from inline import INLINE_SIZE
+from emitter import Emitter, ListSink
+from cache import CompileCache, CACHE_SIZE
+from incremental import ProcedureCache
+
+# Longest request line accepted, in bytes
+MAX_REQUEST = 64 << 20
+
+# Caches of this worker process, set up by open_caches
+cache = None
+procedures = None
+
+
+def open_caches(cache_dir, cache_size):
+    global cache, procedures
+
+    cache = CompileCache(cache_dir, cache_size) if cache_dir else None
+    procedures = ProcedureCache()
+
+
+# Compile one request in a worker. The reply carries what the CLI would have
+# printed: the code, or the code generated before an error and the error.
+def compile_request(source, optimize, inline=None):
+    if cache:
+        key = cache.key(source, optimize, inline)
+        text = cache.get(key)
+
+        if text is not None:
+            return {'ok': True, 'text': text, 'diagnostics': [], 'cached': True}
+
+    sink = ListSink()
+    emitter = Emitter(sink)
+
+    try:
+        result = compile_source(source, optimize, emitter, procedures, inline=inline)
+    except CompileError as e:
+        emitter.close()
+        return {'ok': False, 'text': sink.getvalue(), 'error': str(e), 'line': e.line}
+
+    emitter.close()
+    text = sink.getvalue()
+
+    if cache:
+        cache.put(key, text)
+
+    return {'ok': True, 'text': text, 'diagnostics': result.diagnostics, 'stats': result.stats}
+
+
+# Compile server on a Unix socket. Each request is one line of JSON,
+# {"source": text, "optimize": bool, "inline": N}, answered by one line of
+# JSON from
+# compile_request. Requests on every connection are spread over a pool of
+# worker processes that stay warm between requests, so a compile pays for
+# neither interpreter startup nor imports.
+class Server:
+    def __init__(self, path, jobs=None, cache_dir=None, cache_size=CACHE_SIZE):
+        self.path = path
+        self.pool = ProcessPoolExecutor(jobs, initializer=open_caches, initargs=(cache_dir, cache_size))
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    args = (request['source'], bool(request.get('optimize')), inline_size(request.get('inline')))
+                except (ValueError, KeyError, TypeError):
+                    reply = {'ok': False, 'text': '', 'error': 'invalid request'}
+                else:
+                    # Anything else a compile raises, such as RecursionError
+                    # on deeply nested input, is still answered
+                    try:
+                        reply = await loop.run_in_executor(self.pool, compile_request, *args)
+                    except Exception as e:
+                        reply = {'ok': False, 'text': '', 'error': str(e) or type(e).__name__}
+
+                self.requests += 1
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Client went away, or sent a line longer than MAX_REQUEST
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        try:
+            self.remove_stale()
+        except FileExistsError:
+            self.pool.shutdown()
+            raise
+
+        # Start the workers before the socket exists, so that none of them
+        # inherits it and keeps it accepting after this process is gone
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.pool, int)
+
+        server = await asyncio.start_unix_server(self.handle, self.path, limit=MAX_REQUEST)
+        created = os.stat(self.path)
+
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            self.unlink(created)
+            self.pool.shutdown()
+
+    # A socket left behind by a server that died is replaced, but one a
+    # server still listens on, or anything else at the path, is not ours to
+    # remove
+    def remove_stale(self):
+        try:
+            if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+                raise FileExistsError(f'{self.path} exists and is not a socket')
+
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(self.path)
+        except FileNotFoundError:
+            return
+        except ConnectionRefusedError:
+            os.unlink(self.path)
+            return
+
+        raise FileExistsError(f'a server is already listening on {self.path}')
+
+    # Remove the socket, unless another server has replaced it since
+    def unlink(self, created):
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            return
+
+        if stat.S_ISSOCK(current.st_mode) and (current.st_dev, current.st_ino) == (created.st_dev, created.st_ino):
+            os.unlink(self.path)
+
+
+# Inlining threshold a request asks for: a size, true for the default one,
+# or false or nothing for no inlining
+def inline_size(inline):
+    if inline is True:
+        return INLINE_SIZE
+    elif inline is None or inline is False:
+        return None
+    elif isinstance(inline, int) and inline >= 0:
+        return inline
+
+    raise ValueError('invalid inline size')
+
+
+def serve(path, jobs=None, cache_dir=None, cache_size=CACHE_SIZE):
+    asyncio.run(Server(path, jobs, cache_dir, cache_size).serve())
@@ -0,0 +1,129 @@
+import time
+from contextlib import contextmanager, nullcontext
+
+# Local imports
+from symboltable import SymbolTable
+from oal import MNEMONICS, LABEL, COMMENT
+
+
+# Counters and timings of one compile, filled in by a Parser given this
+# object. A Parser without one binds none of the counting hooks, so
+# compiling without statistics costs nothing extra.
+class CompileStats:
+    def __init__(self):
+        self.productions = {}   # (lhs, rhs) -> times applied
+        self.lookups = 0        # Identifier lookups
+        self.searched = {}      # Scopes out from the innermost one a lookup was found -> lookups
+        self.declarations = 0   # Identifiers declared
+        self.max_depth = 0      # Most scopes open at once
+        self.labels = 0         # Labels allocated by new_label
+        self.opcodes = {}       # Mnemonic -> instructions in the final code
+        self.times = {}         # Phase -> seconds
+
+    # Print hook for grammar rules: count the production, then trace it
+    def rule_hook(self, trace):
+        productions = self.productions
+
+        def rule(lhs, rhs):
+            productions[lhs, rhs] = productions.get((lhs, rhs), 0) + 1
+            trace(lhs, rhs)
+
+        return rule
+
+    # Wrap a token iterator, charging the time spent in it to lexing
+    def timed_tokens(self, tokens):
+        clock = time.perf_counter
+        elapsed = 0.0
+
+        try:
+            while True:
+                start = clock()
+                token = next(tokens, None)
+                elapsed += clock() - start
+
+                if token is None:
+                    return
+
+                yield token
+        finally:
+            self.times['lex'] = self.times.get('lex', 0.0) + elapsed
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.perf_counter() - start
+
+    # Fill in what can be read off the finished compile
+    def finish(self, code, labels, total):
+        self.labels = labels
+
+        for op in code.ops:
+            if op not in (LABEL, COMMENT):
+                self.opcodes[MNEMONICS[op]] = self.opcodes.get(MNEMONICS[op], 0) + 1
+
+        # Whatever was not spent elsewhere went to parsing and generating code
+        self.times['parse'] = total - sum(self.times.values())
+
+    def as_dict(self):
+        return {
+            'productions': {f'{lhs} -> {rhs}': count for (lhs, rhs), count in self.productions.items()},
+            'lookups': self.lookups,
+            'lookups_by_scopes_out': self.searched,
+            'declarations': self.declarations,
+            'max_scope_depth': self.max_depth,
+            'labels': self.labels,
+            'opcodes': self.opcodes,
+            'seconds': self.times,
+        }
+
+    def summary(self):
+        productions = sorted(self.productions.items(), key=lambda item: -item[1])
+        opcodes = sorted(self.opcodes.items(), key=lambda item: -item[1])
+        searched = ', '.join(f'{out} out {count}' for out, count in sorted(self.searched.items()))
+
+        lines = [
+            f'stats: {sum(self.productions.values())} productions applied ({len(self.productions)} distinct), top: '
+            + ', '.join(f'{lhs} -> {rhs} {count}' for (lhs, rhs), count in productions[:5]),
+            f'stats: {self.lookups} lookups ({searched or "none"}), {self.declarations} declarations, '
+            f'max scope depth {self.max_depth}',
+            f'stats: {self.labels} labels, {sum(self.opcodes.values())} instructions: '
+            + ', '.join(f'{mnemonic} {count}' for mnemonic, count in opcodes),
+            'stats: ' + ', '.join(f'{phase} {seconds*1e3:.2f} ms' for phase, seconds in self.times.items()),
+        ]
+
+        return '\n'.join(lines)
+
+
+# SymbolTable that counts lookups, declarations and scope depth
+class CountingSymbolTable(SymbolTable):
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def open_scope(self):
+        super().open_scope()
+        self.stats.max_depth = max(self.stats.max_depth, self.depth)
+
+    def add(self, name, var_type, bounds, base_type, label, level):
+        self.stats.declarations += 1
+        return super().add(name, var_type, bounds, base_type, label, level)
+
+    def get(self, ident):
+        entry = super().get(ident)
+        stats = self.stats
+
+        stats.lookups += 1
+        if entry:
+            out = self.depth - entry.depth
+            stats.searched[out] = stats.searched.get(out, 0) + 1
+
+        return entry
+
+
+# Phase timer of a Parser compiling without statistics
+def no_phase(name):
+    return nullcontext()
@@ -1,40 +1,61 @@
-DEBUG = False
-
+# Every open scope in one table. Each name maps to a stack of its entries,
+# innermost last, so a lookup is a single dict access however deeply scopes
+# nest. Each scope keeps an undo list of the names it declared, which
+# close_scope pops back off their stacks. A root scope at depth 0 is always
+# open, so names can be added before any scope is opened.
 class SymbolTable:
     def __init__(self):
-        # Represented as a dictionary
-        self.table = {}
+        self.table = {}         # Name -> stack of entries, innermost last
+        self.scopes = [[]]      # Undo list of names declared, per open scope
+
+    def open_scope(self):
+        self.scopes.append([])
+
+    def close_scope(self):
+        table = self.table
+
+        for name in self.scopes.pop():
+            entries = table[name]
+            entries.pop()
+
+            if not entries:
+                del table[name]
 
-    # Add a new entry to the symbol table
+    # Scopes opened and not yet closed
+    @property
+    def depth(self):
+        return len(self.scopes) - 1
+
+    # Add a new entry to the innermost scope
     def add(self, name, var_type, bounds, base_type, label, level):
-        if DEBUG:
-            print(f'\n+++ Adding {name} to symbol table with type {var_type}', end='')
-
-            # If array
-            if bounds and base_type:
-                print(' {} .. {} OF {}'.format(*bounds, base_type))
-            else:
-                print()
-            
-        # If symbol is already defined in table
-        if name in self.table:
+        entries = self.table.setdefault(name, [])
+
+        # If symbol is already defined in this scope
+        if entries and entries[-1].depth == self.depth:
             return None
 
         entry = Entry(name, var_type, bounds, base_type, label, level)
-        self.table[name] = entry
+        entry.depth = self.depth
+        entries.append(entry)
+        self.scopes[-1].append(name)
 
         return entry
 
+    # Innermost visible entry for ident, if any
     def get(self, ident):
-        return self.table.get(ident)
+        entries = self.table.get(ident)
+
+        return entries[-1] if entries else None
 
     def print_all(self):
-        for ident, entry in self.table.items():
-            print(entry.__dict__)
+        for ident, entries in self.table.items():
+            print(entries[-1].as_dict())
 
 
 # Symbol table entry
 class Entry:
+    __slots__ = ('name', 'var_type', 'bounds', 'base_type', 'label', 'level', 'depth', 'offset', 'frame_size')
+
     def __init__(self, name, var_type, bounds, base_type, label, level):
         self.name = name
         self.var_type = var_type
@@ -42,3 +63,6 @@ class Entry:
         self.base_type = base_type
         self.label = label
         self.level = level
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__ if hasattr(self, slot)}
@@ -0,0 +1,92 @@
+# Local imports
+from peephole import count_instructions
+from oal import Code, LABEL, COMMENT, SAVE, ASP, JS, JI, PUSH, POP, JP
+
+# Instructions a tail call may be followed by on its way to the exit
+PASSING = frozenset((LABEL, COMMENT))
+
+
+# Turns a procedure's calls to itself that are the last thing it does
+# into jumps back to its entry. A call is in tail position when from the
+# pops after it, through labels, comments and jumps, the next instruction
+# is the asp freeing the frame (or the ji, for a procedure with no
+# locals). The call's display pushes, js and pops become that asp and a jp
+# to the procedure's label, so its save and asp set the frame up again in
+# the same cells, under the same return address. Since the converted calls
+# no longer grow the stack, a procedure recursing only through them has a
+# stack bound for the layout pass.
+class TailCalls:
+    def __init__(self):
+        self.removed = 0        # Instructions removed by the last optimize()
+        self.calls = 0          # Self-calls turned into jumps
+        self.procedures = set() # Labels of procedures with a call turned into a jump
+
+    def optimize(self, code):
+        ops, a = code.ops, code.a
+        positions = {a[i]: i for i, op in enumerate(ops) if op == LABEL}
+        tail = {}           # Index of the first push (or js) of a tail call -> (index after its pops, procedure, frame)
+        proc = frame = None
+
+        for i, op in enumerate(ops):
+            if op == LABEL and i+1 < len(ops) and ops[i+1] == SAVE:
+                proc = a[i]
+                frame = a[i+2] if ops[i+2] == ASP else 0
+            elif op == JS and a[i] == proc:
+                start, stop = i, i+1
+
+                while ops[start-1] == PUSH:
+                    start -= 1
+                while ops[stop] == POP:
+                    stop += 1
+
+                if self.at_exit(ops, a, positions, stop, frame):
+                    tail[start] = stop, proc, frame
+                    self.procedures.add(proc)
+
+        optimized = Code()
+        optimized.comments = code.comments
+        i = 0
+
+        while i < len(ops):
+            if i in tail:
+                stop, proc, frame = tail[i]
+
+                if frame:
+                    optimized.emit(ASP, -frame)
+                optimized.emit(JP, proc)
+
+                self.calls += 1
+                i = stop
+            elif ops[i] == LABEL:
+                optimized.label(a[i])
+                i += 1
+            else:
+                optimized.emit(ops[i], a[i], code.b[i])
+                i += 1
+
+        self.removed = count_instructions(code) - count_instructions(optimized)
+
+        return optimized
+
+    # Whether control from index i goes straight to the end of a procedure
+    # with frame cells of locals
+    def at_exit(self, ops, a, positions, i, frame):
+        seen = set()
+
+        while i not in seen:
+            seen.add(i)
+
+            if ops[i] in PASSING:
+                i += 1
+            elif ops[i] == JP:
+                i = positions[a[i]]
+            elif frame:
+                return ops[i] == ASP and a[i] == -frame and ops[i+1] == JI
+            else:
+                return ops[i] == JI
+
+        return False
+
+    def summary(self):
+        return (f'tailcall: turned {self.calls} self-calls into jumps '
+                f'({len(self.procedures)} procedures), removed {self.removed} instructions')
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+import sys
+import argparse
+
+# Local imports
+from image import load_code, ImageError
+from linker import Program, LinkError, LV, link
+from oal import (
+    MNEMONICS, DATA_LABEL, STACK_LABEL, MAIN_LABEL,
+    INIT, HALT, SAVE, ASP, JS, JI, PUSH, POP,
+    LA, LC, DEREF, ST, ADD, SUB, MULT, DIV, NEG, AND, OR, NOT,
+    LT, LE, NE, EQ, GT, GE, JF, JP, IREAD, CREAD, IWRITE, CWRITE,
+)
+
+# Character code that cwrite turns into a line break
+NEWLINE_CHAR = ord('\\')
+
+# Printed once the program halts
+COMPLETED_MESSAGE = '\nProgram execution completed.\n'
+
+
+class VMError(Exception):
+    pass
+
+
+# Executes OAL code. Memory is a single preallocated list holding every bss
+# area in program order; the display lives in the first cells of the area
+# named by init (L.0) and the runtime stack fills the area named L.1, which
+# grows upward with sp pointing at the next free cell.
+class VM:
+    def __init__(self, code, stdin=None, stdout=None):
+        self.stdin = stdin if stdin else sys.stdin
+        self.stdout = stdout if stdout else sys.stdout
+        self.pending = ''       # Unread part of the current input line
+        self.output = []        # Text written since the last flush
+        self.steps = 0          # Instructions executed by run()
+
+        self.load(code)
+
+    def error(self, message):
+        raise VMError(f'Runtime error: {message}')
+
+    # Take the instructions, resolved labels and memory layout of a program
+    # as linked, linking a Code buffer first
+    def load(self, code):
+        try:
+            program = code if isinstance(code, Program) else link(code)
+        except LinkError as e:
+            raise VMError(f'Load error: {e}')
+
+        if program.display_size is None:
+            raise VMError('Load error: program has no init instruction')
+
+        if program.undefined:
+            raise VMError(f'Load error: undefined label L.{program.undefined[0]}')
+
+        for label, kind in ((DATA_LABEL, program.addresses), (STACK_LABEL, program.addresses),
+                            (MAIN_LABEL, program.targets)):
+            if label not in kind:
+                raise VMError(f'Load error: init refers to undefined label L.{label}')
+
+        self.ops = program.ops.tolist()
+        self.args_a = program.a.tolist()
+        self.args_b = program.b.tolist()
+
+        self.display = program.addresses[DATA_LABEL]
+        self.display_size = program.display_size
+        self.stack = program.addresses[STACK_LABEL]
+        self.mem = [0] * program.mem_size
+
+    def run(self):
+        ops, args_a, args_b = self.ops, self.args_a, self.args_b
+        mem = self.mem
+        display = self.display
+        output = self.output
+        write = output.append
+
+        pc = 0
+        sp = 0
+        steps = 0
+
+        try:
+            while True:
+                op = ops[pc]
+                pc += 1
+                steps += 1
+
+                if op == LV:
+                    address = mem[display+args_b[pc-1]] + args_a[pc-1]
+                    if address < 0:
+                        self.error('invalid memory reference')
+
+                    mem[sp] = mem[address]
+                    sp += 1
+                elif op == LA:
+                    mem[sp] = mem[display+args_b[pc-1]] + args_a[pc-1]
+                    sp += 1
+                elif op == DEREF:
+                    address = mem[sp-1]
+                    if address < 0:
+                        self.error('invalid memory reference')
+
+                    mem[sp-1] = mem[address]
+                elif op == LC:
+                    mem[sp] = args_a[pc-1]
+                    sp += 1
+                elif op == ST:
+                    sp -= 2
+                    address = mem[sp]
+                    if address < 0:
+                        self.error('invalid memory reference')
+
+                    mem[address] = mem[sp+1]
+                elif op == JF:
+                    sp -= 1
+                    if not mem[sp]:
+                        pc = args_a[pc-1]
+                elif op == JP:
+                    pc = args_a[pc-1]
+                elif op == ADD:
+                    sp -= 1
+                    mem[sp-1] += mem[sp]
+                elif op == SUB:
+                    sp -= 1
+                    mem[sp-1] -= mem[sp]
+                elif op == LT:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] < mem[sp] else 0
+                elif op == LE:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] <= mem[sp] else 0
+                elif op == GT:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] > mem[sp] else 0
+                elif op == GE:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] >= mem[sp] else 0
+                elif op == EQ:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] == mem[sp] else 0
+                elif op == NE:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] != mem[sp] else 0
+                elif op == AND:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] and mem[sp] else 0
+                elif op == OR:
+                    sp -= 1
+                    mem[sp-1] = 1 if mem[sp-1] or mem[sp] else 0
+                elif op == NOT:
+                    mem[sp-1] = 0 if mem[sp-1] else 1
+                elif op == MULT:
+                    sp -= 1
+                    mem[sp-1] *= mem[sp]
+                elif op == DIV:
+                    sp -= 1
+                    if not mem[sp]:
+                        self.error('division by zero')
+
+                    # Truncate toward zero
+                    quotient = abs(mem[sp-1]) // abs(mem[sp])
+                    mem[sp-1] = quotient if (mem[sp-1] < 0) == (mem[sp] < 0) else -quotient
+                elif op == NEG:
+                    mem[sp-1] = -mem[sp-1]
+                elif op == PUSH:
+                    mem[sp] = mem[display+args_a[pc-1]] + args_b[pc-1]
+                    sp += 1
+                elif op == POP:
+                    sp -= 1
+                    mem[display+args_a[pc-1]] = mem[sp] - args_b[pc-1]
+                elif op == JS:
+                    mem[sp] = pc
+                    sp += 1
+                    pc = args_a[pc-1]
+                elif op == JI:
+                    sp -= 1
+                    pc = mem[sp]
+                elif op == SAVE:
+                    mem[display+args_a[pc-1]] = sp + args_b[pc-1]
+                elif op == ASP:
+                    sp += args_a[pc-1]
+                elif op == IWRITE:
+                    sp -= 1
+                    write(str(mem[sp]))
+                elif op == CWRITE:
+                    sp -= 1
+                    write('\n' if mem[sp] == NEWLINE_CHAR else chr(mem[sp]))
+                elif op == IREAD:
+                    mem[sp] = self.read_int()
+                    sp += 1
+                elif op == CREAD:
+                    mem[sp] = ord(self.read_char())
+                    sp += 1
+                elif op == INIT:
+                    mem[display] = display
+                    sp = self.stack
+                    pc = args_a[pc-1]
+                elif op == HALT:
+                    break
+                else:
+                    self.error(f'unexpected {MNEMONICS[op]} instruction')
+        except IndexError:
+            if pc >= len(ops):
+                self.error('ran past end of program')
+
+            self.error('stack overflow' if sp >= len(mem) else 'invalid memory reference')
+        finally:
+            self.steps += steps
+            self.flush()
+
+        self.stdout.write(COMPLETED_MESSAGE)
+        self.stdout.flush()
+
+    def flush(self):
+        if self.output:
+            self.stdout.write(''.join(self.output))
+            self.output.clear()
+
+        self.stdout.flush()
+
+    # Skip whitespace in the input and return the rest of the current line
+    def next_input(self):
+        # Prompts written so far must be visible before waiting for input
+        self.flush()
+
+        self.pending = self.pending.lstrip()
+
+        while not self.pending:
+            line = self.stdin.readline()
+
+            if not line:
+                self.error('unexpected end of input')
+
+            self.pending = line.lstrip()
+
+        return self.pending
+
+    def read_int(self):
+        pending = self.next_input()
+        end = 1 if pending[0] in '+-' else 0
+
+        while end < len(pending) and pending[end].isdigit():
+            end += 1
+
+        try:
+            value = int(pending[:end])
+        except ValueError:
+            self.error(f'invalid integer input: {pending.split()[0]}')
+
+        self.pending = pending[end:]
+
+        return value
+
+    def read_char(self):
+        pending = self.next_input()
+        self.pending = pending[1:]
+
+        return pending[0]
+
+
+def main(input_filename):
+    # Text and binary images both load, but images skip parsing and linking
+    try:
+        vm = VM(load_code(input_filename))
+    except (ImageError, ValueError, VMError) as e:
+        print(e)
+        sys.exit(1)
+
+    try:
+        vm.run()
+    except VMError as e:
+        print(e)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Run an OAL program.')
+    arg_parser.add_argument('input', help='OAL source file or binary image')
+    args = arg_parser.parse_args()
+
+    main(args.input)